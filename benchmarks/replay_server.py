@@ -0,0 +1,234 @@
+from src.models.tweet import parse_count
+import argparse
+import html
+import json
+import os
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "timeline.json")
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Replay</title>
+<style>article {{ min-height: 140px; border-bottom: 1px solid #ccc; }}</style>
+</head>
+<body>
+<nav><a data-testid="AppTabBar_Home_Link" href="/home">Home</a></nav>
+<div id="timeline">{cells}</div>
+<script>
+const nextUrl = {next_url};
+const keepCells = {keep_cells};
+let page = 1, loading = false, done = false;
+window.addEventListener("scroll", () => {{
+    if (loading || done) return;
+    if (window.innerHeight + window.scrollY < document.body.scrollHeight - 200) return;
+    loading = true;
+    fetch(nextUrl + page).then((r) => r.text()).then((fragment) => {{
+        const timeline = document.getElementById("timeline");
+        if (!fragment.trim()) {{
+            done = true;
+        }} else {{
+            timeline.insertAdjacentHTML("beforeend", fragment);
+            page += 1;
+            // Mimic the virtualized list by dropping cells far above the viewport
+            while (keepCells && timeline.children.length > keepCells) {{
+                timeline.children[1].remove();
+            }}
+        }}
+        loading = false;
+    }});
+}});
+</script>
+</body>
+</html>
+"""
+
+CELL_TEMPLATE = """<div data-testid="cellInnerDiv"><article data-testid="tweet">
+<div data-testid="User-Name">
+<div class="css-175oi2r r-1ez5h0i"><div class="r-1wbh5a2"><span>{username}</span></div></div>
+<div class="css-175oi2r r-18u37iz r-1q142lx"><a role="link" href="{url}"><time datetime="{timestamp}">{timestamp}</time></a></div>
+</div>
+<div data-testid="tweetText">{text}</div>
+<div data-testid="reply">{replies}</div>
+<div data-testid="retweet">{retweets}</div>
+<div data-testid="like">{likes}</div>
+</article></div>
+"""
+
+DETAIL_PATH = re.compile(r"^/([^/]+)/status/(\d+)$")
+
+SEARCH_ID_BASE = 1_000_000
+REPLY_ID_BASE = 10**12
+
+
+class ReplayServer:
+    """Serves recorded timeline tweets as search and tweet-detail pages.
+
+    Recorded records are cycled to build a timeline of total_tweets tweets,
+    delivered in batches of batch_size as the page scrolls, each batch
+    delayed by latency seconds.
+    """
+
+    def __init__(
+        self,
+        total_tweets: int = 500,
+        batch_size: int = 20,
+        latency: float = 0.2,
+        max_replies: int = 30,
+        keep_cells: int = 0,
+        port: int = 0,
+    ):
+        with open(FIXTURE_PATH, "r", encoding="utf-8") as f:
+            self.records: List[Dict] = json.load(f)
+        self.total_tweets = total_tweets
+        self.batch_size = batch_size
+        self.latency = latency
+        self.max_replies = max_replies
+        self.keep_cells = keep_cells
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def search_tweet(self, position: int) -> Dict:
+        record = self.records[position % len(self.records)]
+        status_id = SEARCH_ID_BASE + position
+        return dict(record, status_id=status_id, url=self.status_path(record, status_id))
+
+    def reply_count(self, position: int) -> int:
+        record = self.records[position % len(self.records)]
+        return min(parse_count(record["engagement"]["replies"]), self.max_replies)
+
+    def reply_tweet(self, parent_position: int, position: int) -> Dict:
+        record = self.records[(parent_position + position + 1) % len(self.records)]
+        status_id = REPLY_ID_BASE + parent_position * 1_000 + position
+        return dict(record, status_id=status_id, url=self.status_path(record, status_id))
+
+    def status_path(self, record: Dict, status_id: int) -> str:
+        return f"{self.url}/{record['username'].lstrip('@')}/status/{status_id}"
+
+    def render_cells(self, tweets: List[Dict]) -> str:
+        return "".join(
+            CELL_TEMPLATE.format(
+                username=html.escape(tweet["username"]),
+                url=html.escape(tweet["url"]),
+                timestamp=tweet["timestamp"],
+                text=html.escape(tweet["text"]),
+                replies=tweet["engagement"]["replies"],
+                retweets=tweet["engagement"]["retweets"],
+                likes=tweet["engagement"]["likes"],
+            )
+            for tweet in tweets
+        )
+
+    def search_batch(self, page: int) -> List[Dict]:
+        start = page * self.batch_size
+        end = min(start + self.batch_size, self.total_tweets)
+        return [self.search_tweet(position) for position in range(start, end)]
+
+    def reply_batch(self, parent_position: int, page: int) -> List[Dict]:
+        start = page * self.batch_size
+        end = min(start + self.batch_size, self.reply_count(parent_position))
+        return [self.reply_tweet(parent_position, i) for i in range(start, end)]
+
+    def render_page(self, cells: str, next_url: str) -> str:
+        return PAGE_TEMPLATE.format(
+            cells=cells, next_url=json.dumps(next_url), keep_cells=self.keep_cells
+        )
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def send_html(self, body: str, status: int = 200):
+                payload = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                parsed = urllib.parse.urlparse(self.path)
+                query = urllib.parse.parse_qs(parsed.query)
+                page = int(query.get("page", ["0"])[0])
+
+                if parsed.path in ("/", "/home"):
+                    return self.send_html(server.render_page("", "/api/timeline?page="))
+                if parsed.path == "/search":
+                    cells = server.render_cells(server.search_batch(0))
+                    return self.send_html(
+                        server.render_page(cells, "/api/timeline?page=")
+                    )
+                if parsed.path == "/api/timeline":
+                    time.sleep(server.latency)
+                    return self.send_html(server.render_cells(server.search_batch(page)))
+                if parsed.path.startswith("/api/replies/"):
+                    time.sleep(server.latency)
+                    parent_position = int(parsed.path.rsplit("/", 1)[1])
+                    return self.send_html(
+                        server.render_cells(server.reply_batch(parent_position, page))
+                    )
+
+                match = DETAIL_PATH.match(parsed.path)
+                if match:
+                    position = int(match.group(2)) - SEARCH_ID_BASE
+                    if not 0 <= position < server.total_tweets:
+                        return self.send_html("Not found", 404)
+                    cells = server.render_cells(
+                        [server.search_tweet(position)]
+                        + server.reply_batch(position, 0)
+                    )
+                    return self.send_html(
+                        server.render_page(cells, f"/api/replies/{position}?page=")
+                    )
+
+                self.send_html("Not found", 404)
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve recorded timeline pages")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tweets", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--keep-cells", type=int, default=0)
+    args = parser.parse_args()
+
+    replay = ReplayServer(
+        total_tweets=args.tweets,
+        batch_size=args.batch_size,
+        latency=args.latency,
+        keep_cells=args.keep_cells,
+        port=args.port,
+    )
+    print(f"Serving recorded timeline at {replay.url}/search?q=test")
+    try:
+        replay.httpd.serve_forever()
+    except KeyboardInterrupt:
+        replay.stop()
@@ -0,0 +1,306 @@
+"""Offline throughput benchmark for TweetExtractor.
+
+Serves recorded timeline pages from a local ReplayServer, points a Browser
+and TweetExtractor at it and reports, per scenario, tweets per second,
+WebDriver calls per tweet (counted by RunMetrics), time spent waiting vs.
+extracting and peak RSS.
+Results are written to benchmarks/results/ so runs can be compared across
+commits:
+
+    python -m benchmarks.run_benchmark --tweets 300
+    python -m benchmarks.run_benchmark --compare
+"""
+
+from benchmarks.replay_server import ReplayServer
+from src.extractors.tweet_extractor import TweetExtractor
+from src.savers.tweet_index import TweetIndex
+from src.utils.browser import Browser
+from src.utils.waits import AdaptiveWaiter
+import argparse
+import json
+import os
+import resource
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def process_tree_rss(root_pid: int) -> Optional[int]:
+    """Sum VmRSS in bytes of root_pid and all its descendants (Linux only)"""
+    parents = {}
+    try:
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+    except OSError:
+        return None
+
+    tree, frontier = {root_pid}, [root_pid]
+    while frontier:
+        pid = frontier.pop()
+        children = [child for child, parent in parents.items() if parent == pid]
+        tree.update(children)
+        frontier.extend(children)
+
+    total = 0
+    for pid in tree:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            continue
+    return total
+
+
+class RssSampler:
+    """Tracks the peak RSS of the chromedriver/Chrome process tree"""
+
+    def __init__(self, root_pid: Optional[int], interval: float = 0.5):
+        self.root_pid = root_pid
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = process_tree_rss(self.root_pid) if self.root_pid else None
+            if rss:
+                self.peak = max(self.peak, rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class ParentCollector:
+    """Stands in for CommentCrawler so the search pass is measured on its own"""
+
+    def __init__(self):
+        self.parents: List[str] = []
+
+    def enqueue(
+        self,
+        tweet_url: str,
+        keyword: str,
+        reply_count: Optional[int] = None,
+        max_replies: Optional[int] = None,
+    ):
+        self.parents.append(tweet_url)
+
+
+def measure(name, extractor, browser, action) -> Dict:
+    extractor.waiter = AdaptiveWaiter(
+        max_wait=extractor.waiter.max_wait,
+        quiet_period=extractor.waiter.quiet_period,
+        scroll_step=extractor.waiter.scroll_step,
+    )
+    calls_before = browser.metrics.driver_calls(browser.driver)
+    with RssSampler(browser.driver.service.process.pid) as sampler:
+        started = time.time()
+        tweets = action()
+        elapsed = time.time() - started
+
+    calls = browser.metrics.driver_calls(browser.driver) - calls_before
+    wait_seconds = sum(stats["total"] for stats in extractor.waiter.summary().values())
+    result = {
+        "scenario": name,
+        "tweets": len(tweets),
+        "seconds": round(elapsed, 3),
+        "tweets_per_second": round(len(tweets) / elapsed, 2) if elapsed else 0,
+        "webdriver_calls": calls,
+        "calls_per_tweet": round(calls / len(tweets), 2) if tweets else None,
+        "wait_seconds": round(wait_seconds, 3),
+        "extraction_seconds": round(max(elapsed - wait_seconds, 0), 3),
+        "waits": extractor.waiter.summary(),
+        "peak_chrome_rss_mb": round(sampler.peak / 2**20, 1) if sampler.peak else None,
+    }
+    print(
+        f"{name}: {result['tweets']} tweets in {result['seconds']}s "
+        f"({result['tweets_per_second']}/s), {result['calls_per_tweet']} calls/tweet, "
+        f"waits {result['wait_seconds']}s"
+    )
+    return result
+
+
+def run_benchmark(args) -> Dict:
+    server = ReplayServer(
+        total_tweets=args.tweets,
+        batch_size=args.batch_size,
+        latency=args.latency,
+        max_replies=args.max_replies,
+        keep_cells=args.keep_cells,
+    ).start()
+    browser = None
+    workdir = tempfile.mkdtemp(prefix="tweet_bench_")
+    results = []
+    try:
+        browser = Browser(
+            waiter=AdaptiveWaiter(max_wait=args.max_wait),
+            authenticate=False,
+            headless=not args.headed,
+            # A throwaway profile: the benchmark shouldn't depend on config.json
+            settings={},
+        )
+        for mode in args.modes:
+            # A fresh index per mode so every scenario sees the same timeline
+            index = TweetIndex(os.path.join(workdir, f"{mode}.db"))
+            extractor = TweetExtractor(
+                batch_extraction=mode == "batch",
+                index=index,
+                waiter=AdaptiveWaiter(max_wait=args.max_wait),
+                base_url=server.url,
+            )
+            parents = ParentCollector()
+            results.append(
+                measure(
+                    f"search_and_extract[{mode}]",
+                    extractor,
+                    browser,
+                    lambda: extractor.search_and_extract(
+                        browser.driver,
+                        "benchmark",
+                        target_tweets=args.tweets,
+                        comment_queue=parents,
+                    ),
+                )
+            )
+
+            # The extractor logs and skips errors per tweet, so a collector
+            # that doesn't fit would otherwise leave the reply pass empty
+            if args.max_replies and args.comment_threads and not parents.parents:
+                raise RuntimeError(f"No parent tweets were queued in {mode} mode")
+
+            def crawl_comments():
+                comments = []
+                for parent_url in parents.parents[: args.comment_threads]:
+                    comments.extend(
+                        extractor.extract_comments(
+                            browser.driver, parent_url, return_to_previous=False
+                        )
+                    )
+                return comments
+
+            results.append(
+                measure(
+                    f"extract_comments[{mode}]",
+                    extractor,
+                    browser,
+                    crawl_comments,
+                )
+            )
+            if args.max_replies and not results[-1]["tweets"]:
+                raise RuntimeError(f"No replies were collected in {mode} mode")
+            index.close()
+    finally:
+        if browser:
+            browser.close()
+        server.stop()
+
+    return {
+        "commit": current_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "parameters": {
+            "tweets": args.tweets,
+            "batch_size": args.batch_size,
+            "latency": args.latency,
+            "max_replies": args.max_replies,
+            "comment_threads": args.comment_threads,
+            "keep_cells": args.keep_cells,
+            "max_wait": args.max_wait,
+        },
+        "peak_python_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+        "scenarios": results,
+    }
+
+
+def current_commit() -> str:
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+            )
+            .decode()
+            .strip()
+        )
+    except Exception:
+        return "unknown"
+
+
+def save_results(report: Dict) -> str:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = os.path.join(RESULTS_DIR, f"bench_{stamp}_{report['commit']}.json")
+    with open(filename, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Results written to {filename}")
+    return filename
+
+
+def compare_latest():
+    """Print tweets/s and calls/tweet of the two most recent result files"""
+    files = []
+    if os.path.isdir(RESULTS_DIR):
+        files = sorted(f for f in os.listdir(RESULTS_DIR) if f.startswith("bench_"))
+    if len(files) < 2:
+        print("Need at least two result files to compare")
+        return
+
+    reports = []
+    for file in files[-2:]:
+        with open(os.path.join(RESULTS_DIR, file), "r", encoding="utf-8") as f:
+            reports.append(json.load(f))
+    before, after = ({s["scenario"]: s for s in r["scenarios"]} for r in reports)
+
+    print(f"{reports[0]['commit']} -> {reports[1]['commit']}")
+    for name, new in after.items():
+        old = before.get(name)
+        if not old:
+            continue
+        print(
+            f"{name}: {old['tweets_per_second']} -> {new['tweets_per_second']} tweets/s, "
+            f"{old['calls_per_tweet']} -> {new['calls_per_tweet']} calls/tweet, "
+            f"{old['wait_seconds']} -> {new['wait_seconds']}s waiting"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the tweet extractor offline")
+    parser.add_argument("--tweets", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--max-replies", type=int, default=30)
+    parser.add_argument("--comment-threads", type=int, default=5)
+    parser.add_argument("--keep-cells", type=int, default=0)
+    parser.add_argument("--max-wait", type=float, default=10.0)
+    parser.add_argument(
+        "--modes", nargs="+", default=["batch", "element"], choices=["batch", "element"]
+    )
+    parser.add_argument("--headed", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_latest()
+    else:
+        save_results(run_benchmark(args))
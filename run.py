@@ -1,4 +1,45 @@
-from src.main import main
+import argparse
+
+from src.main import main, import_index, compact_output, convert_output, serve
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Scrape tweets by keyword")
+    parser.add_argument(
+        "--resume",
+        nargs="?",
+        const="",
+        metavar="CHECKPOINT",
+        help="resume the latest unfinished run, or the given checkpoint file",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="keep browsers warm and crawl jobs from the job queue until stopped",
+    )
+    parser.add_argument(
+        "--import-index",
+        action="store_true",
+        help="backfill the tweet index from existing output files and exit",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="merge output files into the deduplicated store, archive them and exit",
+    )
+    parser.add_argument(
+        "--convert",
+        metavar="NDJSON_FILE",
+        help="convert a streamed .ndjson output file to a pretty JSON array and exit",
+    )
+    args = parser.parse_args()
+
+    if args.daemon:
+        serve()
+    elif args.import_index:
+        import_index()
+    elif args.compact:
+        compact_output()
+    elif args.convert:
+        convert_output(args.convert)
+    else:
+        main(resume=args.resume is not None, checkpoint_path=args.resume or None)
@@ -0,0 +1,110 @@
+import logging
+import queue
+import threading
+from typing import Callable, List, Optional, Tuple
+
+
+class CommentCrawler:
+    """Collects replies for queued parent tweets on dedicated browser sessions.
+
+    The search pass only enqueues parent tweet URLs, so the timeline is never
+    left mid-scroll. Each worker drains the queue on its own session.
+    """
+
+    def __init__(
+        self,
+        extractor,
+        browsers: List,
+        on_tweets: Callable[[List], None],
+        queue_depth: int = 100,
+        max_replies: Optional[int] = 50,
+        supervisor=None,
+    ):
+        self.extractor = extractor
+        self.browsers = browsers
+        self.on_tweets = on_tweets
+        self.max_replies = max_replies
+        # Optional BrowserSupervisor that restarts dead or bloated sessions
+        self.supervisor = supervisor
+        # Bounded so a slow comment stage pushes back on the search pass
+        self.queue: "queue.Queue[Optional[Tuple]]" = queue.Queue(
+            maxsize=queue_depth
+        )
+        self.threads: List[threading.Thread] = []
+        self._in_progress = {}
+        self._lock = threading.Lock()
+
+    def enqueue(
+        self,
+        tweet_url: str,
+        keyword: str,
+        reply_count: Optional[int] = None,
+        max_replies: Optional[int] = None,
+    ):
+        """Queue a parent tweet; max_replies caps this thread below the default"""
+        self.queue.put((tweet_url, keyword, reply_count, max_replies))
+        logging.debug(f"Queued replies for {tweet_url} ({self.queue.qsize()} pending)")
+
+    def pending(self) -> List[Tuple]:
+        """Parent tweets queued or being crawled, as enqueue() arguments"""
+        with self.queue.mutex:
+            queued = [item for item in self.queue.queue if item is not None]
+        with self._lock:
+            return list(self._in_progress.values()) + queued
+
+    def start(self):
+        for browser in self.browsers:
+            thread = threading.Thread(target=self._worker, args=(browser,), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def join(self):
+        """Wait until every queued parent tweet has been crawled"""
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    def stop(self):
+        """Drop the queued parent tweets and stop the workers.
+
+        Save pending() first if the dropped threads should be crawled later.
+        """
+        with self.queue.mutex:
+            self.queue.queue.clear()
+            self.queue.not_full.notify_all()
+        self.join()
+
+    def _worker(self, browser):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            tweet_url, keyword, reply_count, max_replies = item
+            if max_replies is None or (
+                self.max_replies is not None and self.max_replies < max_replies
+            ):
+                max_replies = self.max_replies
+            with self._lock:
+                self._in_progress[threading.get_ident()] = item
+            try:
+                if self.supervisor is not None:
+                    self.supervisor.checkup(browser)
+                comments = self.extractor.extract_comments(
+                    browser.driver,
+                    tweet_url,
+                    max_replies=max_replies,
+                    return_to_previous=False,
+                    reply_count=reply_count,
+                )
+                for comment in comments:
+                    comment.parent_tweet_url = tweet_url
+                    comment.keyword = keyword
+                if comments:
+                    self.on_tweets(comments)
+            except Exception as e:
+                logging.error(f"Error crawling replies for {tweet_url}: {e}")
+            finally:
+                with self._lock:
+                    self._in_progress.pop(threading.get_ident(), None)
@@ -0,0 +1,230 @@
+from src.extractors.tweet_extractor import TweetExtractor
+from src.models.tweet import Tweet, parse_status_id
+from src.utils.selectors import REPLY, TWEET
+import json
+import logging
+import urllib.parse
+import weakref
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional
+
+
+SEARCH_ENDPOINT = "/SearchTimeline"
+DETAIL_ENDPOINT = "/TweetDetail"
+
+
+def iter_tweet_results(node) -> Iterator[Dict]:
+    """Yield every tweet result object in a GraphQL timeline payload.
+
+    Retweets yield the original tweet, and quoted tweets are not descended
+    into, matching what the rendered timeline shows as separate articles.
+    """
+    if isinstance(node, list):
+        for item in node:
+            yield from iter_tweet_results(item)
+        return
+    if not isinstance(node, dict):
+        return
+
+    typename = node.get("__typename")
+    if typename == "TweetWithVisibilityResults" and "tweet" in node:
+        yield from iter_tweet_results(node["tweet"])
+        return
+    if typename == "Tweet" and "legacy" in node:
+        retweeted = node["legacy"].get("retweeted_status_result")
+        if retweeted:
+            yield from iter_tweet_results(retweeted)
+        else:
+            yield node
+        return
+
+    for value in node.values():
+        yield from iter_tweet_results(value)
+
+
+class NetworkTweetExtractor(TweetExtractor):
+    """Builds tweets from the timeline JSON the web client already downloads.
+
+    Responses are read from Chrome's performance log, so the Browser must be
+    started with capture_network=True. Whenever a step captures nothing the
+    DOM extraction in TweetExtractor is used instead.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Per-driver state: requests still loading and tweets not yet consumed
+        self._pending = weakref.WeakKeyDictionary()
+        self._captured = weakref.WeakKeyDictionary()
+        self._unsupported = weakref.WeakSet()
+        # Drivers whose timeline requests were answered with 429 Too Many Requests
+        self._throttled = weakref.WeakSet()
+
+    def capture_responses(self, driver) -> Optional[Dict[str, List[Dict]]]:
+        """Drain the performance log and parse finished timeline responses.
+
+        Returns captured tweet records grouped by endpoint, or None if the
+        driver has no performance log.
+        """
+        if driver in self._unsupported:
+            return None
+        try:
+            entries = driver.get_log("performance")
+        except Exception as e:
+            logging.warning(f"Network capture unavailable, using DOM extraction: {e}")
+            self._unsupported.add(driver)
+            return None
+
+        pending = self._pending.setdefault(driver, {})
+        captured = self._captured.setdefault(
+            driver, {SEARCH_ENDPOINT: [], DETAIL_ENDPOINT: []}
+        )
+
+        for entry in entries:
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError):
+                continue
+            method = message.get("method")
+            params = message.get("params", {})
+
+            if method == "Network.responseReceived":
+                response = params.get("response", {})
+                url = response.get("url", "")
+                for endpoint in (SEARCH_ENDPOINT, DETAIL_ENDPOINT):
+                    if endpoint not in urllib.parse.urlparse(url).path:
+                        continue
+                    if response.get("status") == 429:
+                        self._throttled.add(driver)
+                    else:
+                        pending[params["requestId"]] = (endpoint, url)
+            elif method == "Network.loadingFinished":
+                request = pending.pop(params.get("requestId"), None)
+                if request:
+                    endpoint, url = request
+                    captured[endpoint].extend(
+                        self.read_response(driver, params["requestId"], endpoint, url)
+                    )
+
+        return captured
+
+    def rate_limit_reason(self, driver) -> Optional[str]:
+        # Responses of the last scroll step haven't been drained yet
+        self.capture_responses(driver)
+        if driver in self._throttled:
+            self._throttled.discard(driver)
+            return "HTTP 429 from the timeline API"
+        return super().rate_limit_reason(driver)
+
+    def read_response(
+        self, driver, request_id: str, endpoint: str, url: str
+    ) -> List[Dict]:
+        try:
+            response = driver.execute_cdp_cmd(
+                "Network.getResponseBody", {"requestId": request_id}
+            )
+            payload = json.loads(response["body"])
+        except Exception as e:
+            logging.error(f"Error reading timeline response: {e}")
+            return []
+
+        focal_id = None
+        if endpoint == DETAIL_ENDPOINT:
+            try:
+                query = urllib.parse.parse_qs(urllib.parse.urlparse(url).query)
+                focal_id = json.loads(query["variables"][0]).get("focalTweetId")
+            except Exception:
+                pass
+
+        origin = "{0.scheme}://{0.netloc}".format(urllib.parse.urlparse(url))
+        if origin.endswith("api.twitter.com") or origin.endswith("api.x.com"):
+            origin = origin.replace("api.", "", 1)
+
+        records = []
+        for result in iter_tweet_results(payload):
+            # On detail pages only replies to the focal tweet count as comments
+            if endpoint == DETAIL_ENDPOINT and result.get("rest_id") == focal_id:
+                continue
+            record = self.record_from_result(result, origin)
+            if record:
+                records.append(record)
+        return records
+
+    def record_from_result(self, result: Dict, origin: str) -> Optional[Dict]:
+        try:
+            legacy = result["legacy"]
+            user = result["core"]["user_results"]["result"]
+            screen_name = (
+                user.get("core", {}).get("screen_name")
+                or user["legacy"]["screen_name"]
+            )
+            note = result.get("note_tweet", {}).get("note_tweet_results", {})
+            text = note.get("result", {}).get("text") or legacy["full_text"]
+            created_at = datetime.strptime(
+                legacy["created_at"], "%a %b %d %H:%M:%S %z %Y"
+            )
+            return {
+                "username": f"@{screen_name}",
+                "text": text,
+                "tweet_url": f"{origin}/{screen_name}/status/{result['rest_id']}",
+                "timestamp": created_at.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                "engagement": {
+                    "replies": str(legacy.get("reply_count", 0)),
+                    "retweets": str(legacy.get("retweet_count", 0)),
+                    "likes": str(legacy.get("favorite_count", 0)),
+                },
+            }
+        except Exception as e:
+            logging.debug(f"Skipping unparseable tweet result: {e}")
+            return None
+
+    def collect_new_tweets(
+        self,
+        driver,
+        is_seen: Callable[[str], bool],
+        container: str = TWEET,
+        stats: Optional[Dict[str, int]] = None,
+        seen: Optional[List[Tweet]] = None,
+    ) -> List[Tweet]:
+        captured = self.capture_responses(driver)
+        endpoint = DETAIL_ENDPOINT if container == REPLY else SEARCH_ENDPOINT
+        records = captured[endpoint] if captured else []
+        if not records:
+            return super().collect_new_tweets(driver, is_seen, container, stats, seen)
+        if stats is None:
+            stats = {}
+        stats["batch_ids"] = []
+
+        captured[endpoint] = []
+        new_tweets = []
+        batch_urls = set()
+        for record in records:
+            tweet_url = record["tweet_url"]
+            if tweet_url in batch_urls:
+                continue
+            stats["candidates"] = stats.get("candidates", 0) + 1
+            stats["batch_ids"].append(parse_status_id(tweet_url))
+            if is_seen(tweet_url):
+                stats["duplicates"] = stats.get("duplicates", 0) + 1
+                if seen is not None:
+                    seen_tweet = self.tweet_from_record(record)
+                    if seen_tweet:
+                        seen.append(seen_tweet)
+                continue
+            tweet_data = self.tweet_from_record(record)
+            if tweet_data:
+                new_tweets.append(tweet_data)
+                batch_urls.add(tweet_url)
+        return new_tweets
+
+    def discard_captured(self, driver):
+        """Drop responses left over from the previous page"""
+        if self.capture_responses(driver):
+            self._captured[driver] = {SEARCH_ENDPOINT: [], DETAIL_ENDPOINT: []}
+
+    def extract_comments(self, driver, tweet_url: str, *args, **kwargs):
+        self.discard_captured(driver)
+        return super().extract_comments(driver, tweet_url, *args, **kwargs)
+
+    def search_and_extract(self, driver, keyword, *args, **kwargs):
+        self.discard_captured(driver)
+        return super().search_and_extract(driver, keyword, *args, **kwargs)
@@ -1,22 +1,224 @@
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from src.models.tweet import Tweet  # Updated import path
+from selenium.common.exceptions import (
+    InvalidSessionIdException,
+    NoSuchWindowException,
+    TimeoutException,
+)
+from src.models.tweet import Tweet, parse_status_id  # Updated import path
+from src.utils.browser import SearcherDriver, SelectorMissError
+from src.utils.metrics import RunMetrics
+from src.utils.scheduler import NO_RESULTS_REASON, RateLimitError, detect_rate_limit
+from src.utils.selectors import (
+    LIKES,
+    REPLIES,
+    REPLY,
+    RETWEETS,
+    TIMESTAMP,
+    TWEET,
+    TWEET_FIELDS,
+    TWEET_TEXT,
+    USERNAME,
+)
+from src.utils.status_ids import BLOOM, EXACT, BloomFilter, StatusIdSet
+from src.utils.waits import AdaptiveWaiter
 import logging
 import time
 import urllib.parse
 from datetime import datetime
 import os
 import json
-from typing import Set, List, Dict
+import threading
+from array import array
+from typing import Callable, Set, List, Dict, Optional
+
+
+# Collects every rendered tweet in one round trip and returns them as a JSON
+# string so the driver only has to ship one value back. arguments[0] lists
+# the tweet container selectors to try in order and arguments[1] maps each
+# field to its own; the selectors that matched and the fields that didn't
+# are reported back so SearcherDriver can track them.
+# Cells already read are tagged with data-scraped (set to the tweet URL, so a
+# cell the virtualized list reuses for another tweet is read again) and
+# skipped on later scroll steps. Only complete records are tagged: a cell
+# whose username or text hasn't rendered yet is read again on the next step.
+SCANNED_ATTRIBUTE = "data-scraped"
+
+# Attributes read along with each field's text by per-element lookups
+FIELD_ATTRIBUTES = {TIMESTAMP: ["datetime"]}
+
+BATCH_EXTRACT_SCRIPT = """
+const [containers, fields] = arguments;
+const query = (root, selector, all) => {
+    try {
+        return all ? root.querySelectorAll(selector) : root.querySelector(selector);
+    } catch (e) {
+        return null;
+    }
+};
+const hits = {};
+const misses = {};
+let articles = [];
+for (const selector of containers) {
+    const found = query(document, selector, true);
+    if (found && found.length) {
+        articles = found;
+        hits.container = selector;
+        break;
+    }
+}
+const pick = (article, name) => {
+    for (const selector of fields[name]) {
+        const el = query(article, selector, false);
+        if (el) {
+            // The first selector that matched stays the one to cache
+            if (!(name in hits)) hits[name] = selector;
+            return el;
+        }
+    }
+    misses[name] = (misses[name] || 0) + 1;
+    return null;
+};
+const text = (article, name) => {
+    const el = pick(article, name);
+    return el ? el.innerText.trim() : null;
+};
+const records = [];
+for (const article of articles) {
+    const time = pick(article, "timestamp");
+    const link = time ? time.closest("a") : null;
+    if (link && article.getAttribute("data-scraped") === link.href) continue;
+    const metrics = {
+        replies: text(article, "replies"),
+        retweets: text(article, "retweets"),
+        likes: text(article, "likes"),
+    };
+    const record = {
+        username: text(article, "username"),
+        tweet_url: link ? link.href : null,
+        timestamp: time ? time.getAttribute("datetime") : null,
+        text: text(article, "tweet_text"),
+        engagement: Object.values(metrics).includes(null) ? {} : metrics,
+    };
+    // The same checks as tweet_from_record; cells still rendering fail them
+    record.complete = Boolean(
+        record.tweet_url &&
+        record.timestamp &&
+        record.username &&
+        record.username.includes("@") &&
+        record.text !== null
+    );
+    records.push(record);
+    if (record.complete) article.setAttribute("data-scraped", link.href);
+}
+return JSON.stringify({
+    rendered: articles.length,
+    records: records,
+    hits: hits,
+    misses: misses,
+});
+"""
+
+# Cells matching arguments[0] that are untagged, or tagged with the URL of
+# another tweet the virtualized list showed in them before. arguments[1]
+# lists the timestamp selectors to try in order, here and in
+# MARK_SCANNED_SCRIPT.
+UNSCANNED_SCRIPT = """
+const [selector, times] = arguments;
+const linkOf = (article) => {
+    for (const timeSelector of times) {
+        const time = article.querySelector(timeSelector);
+        if (time) return time.closest("a");
+    }
+    return null;
+};
+return Array.from(document.querySelectorAll(selector)).filter((article) => {
+    const link = linkOf(article);
+    return !link || article.getAttribute("data-scraped") !== link.href;
+});
+"""
+
+MARK_SCANNED_SCRIPT = """
+for (const article of arguments[0]) {
+    let time = null;
+    for (const selector of arguments[1]) {
+        time = article.querySelector(selector);
+        if (time) break;
+    }
+    const link = time ? time.closest("a") : null;
+    if (link) article.setAttribute("data-scraped", link.href);
+}
+"""
+
+
+# Error messages that mean the driver session itself is gone
+SESSION_LOST_MESSAGES = [
+    "invalid session id",
+    "disconnected",
+    "chrome not reachable",
+    "session deleted",
+    "no such window",
+    "connection refused",
+    "max retries exceeded",
+]
+
+
+def is_session_error(error: Exception) -> bool:
+    """True for driver failures that end the session, such as a Chrome crash.
+
+    Other WebDriverExceptions (timeouts, stale elements, script errors) are
+    about the page rather than the session, so they don't count.
+    """
+    if isinstance(error, (InvalidSessionIdException, NoSuchWindowException)):
+        return True
+    if isinstance(error, TimeoutException):
+        return False
+    message = str(error).lower()
+    return any(text in message for text in SESSION_LOST_MESSAGES)
 
 
 class TweetExtractor:
-    def __init__(self):
-        self.processed_tweet_urls: Set[str] = set()
-        self.processed_comment_urls: Set[str] = set()
+    def __init__(
+        self,
+        batch_extraction: bool = True,
+        index=None,
+        waiter=None,
+        base_url: str = "https://twitter.com",
+        metrics=None,
+        rate_limiter=None,
+        history: str = EXACT,
+        false_positive_rate: float = 0.001,
+        reply_growth: int = 5,
+    ):
+        self.batch_extraction = batch_extraction
+        self.metrics = metrics or RunMetrics()
+        self.base_url = base_url.rstrip("/")
+        self.waiter = waiter or AdaptiveWaiter()
+        # Optional TweetIndex; when set, history is looked up there instead of
+        # being rebuilt from every output file
+        self.index = index
+        # Optional RateLimitScheduler shared by every session
+        self.rate_limiter = rate_limiter
+        # Tweets claimed by this process, by status ID
+        self.processed_tweet_ids = StatusIdSet()
+        self.processed_comment_ids = StatusIdSet()
+        # Parent tweets whose reply thread this run opened
+        self.processed_thread_ids = StatusIdSet()
+        # New replies a known thread needs before it is opened again
+        self.reply_growth = reply_growth
+        # Links without a status ID fall back to the URL itself
+        self.processed_other_urls: Set[str] = set()
+        # Tweets saved by earlier runs: with history="bloom" a BloomFilter,
+        # confirmed against the index when there is one; otherwise an exact
+        # StatusIdSet when there is no index, or None to ask the index directly
+        self.history_mode = history
+        self.false_positive_rate = false_positive_rate
+        self.history = None
         self.search_results = {"successful": [], "failed": []}
-        self.load_existing_tweets()
+        # Shared by all pool workers so two sessions never claim the same tweet
+        self._lock = threading.Lock()
+        if self.index is None:
+            self.load_existing_tweets()
+        elif history == BLOOM:
+            self.load_index_filter()
 
     def load_existing_tweets(self):
         output_dir = os.path.join("data", "output")
@@ -24,6 +226,7 @@ class TweetExtractor:
             os.makedirs(output_dir)
             return
 
+        ids = array("Q")
         for file in os.listdir(output_dir):
             if file.endswith(".json"):
                 try:
@@ -31,18 +234,135 @@ class TweetExtractor:
                         os.path.join(output_dir, file), "r", encoding="utf-8"
                     ) as f:
                         tweets = json.load(f)
+                        if not isinstance(tweets, list):
+                            continue  # search_results_*.json files
                         for tweet in tweets:
-                            self.processed_tweet_urls.add(tweet["tweet_url"])
+                            status_id = parse_status_id(tweet["tweet_url"])
+                            if status_id is not None:
+                                ids.append(status_id)
                 except Exception as e:
                     logging.error(f"Error loading existing tweets from {file}: {e}")
+        self.history = self.new_history(ids)
+
+    def new_history(self, ids):
+        if self.history_mode == BLOOM:
+            history = BloomFilter(len(ids) * 2, self.false_positive_rate)
+        else:
+            history = StatusIdSet()
+        history.update(ids)
+        return history
+
+    def load_index_filter(self):
+        """Put a Bloom filter of the index in front of its lookups.
+
+        Most candidates are new tweets, which the filter rules out without
+        touching SQLite; hits are still confirmed by the index.
+        """
+        started = time.time()
+        capacity = max(self.index.count() * 2, 100000)
+        self.history = BloomFilter(capacity, self.false_positive_rate)
+        self.history.update(self.index.iter_status_ids())
+        logging.info(
+            f"Loaded {len(self.history)} indexed tweets into a "
+            f"{len(self.history.bits) / 2**20:.1f} MB Bloom filter "
+            f"in {time.time() - started:.1f}s"
+        )
+
+    def in_history(self, status_id: int, url: str) -> bool:
+        if self.history is not None and status_id not in self.history:
+            return False
+        if self.index is not None:
+            return self.index.contains(url)
+        return self.history is not None
+
+    def is_processed_tweet(self, url: str) -> bool:
+        status_id = parse_status_id(url)
+        if status_id is None:
+            return url in self.processed_other_urls
+        if status_id in self.processed_tweet_ids:
+            return True
+        return self.in_history(status_id, url)
+
+    def is_processed_comment(self, url: str) -> bool:
+        status_id = parse_status_id(url)
+        if status_id is None:
+            return url in self.processed_other_urls
+        if status_id in self.processed_comment_ids:
+            return True
+        return self.in_history(status_id, url)
+
+    def claim_url(self, url: str, processed_ids: StatusIdSet) -> bool:
+        """Atomically mark url as processed, returning False if already taken"""
+        status_id = parse_status_id(url)
+        with self._lock:
+            if status_id is not None:
+                return processed_ids.add(status_id)
+            if url in self.processed_other_urls:
+                return False
+            self.processed_other_urls.add(url)
+            return True
+
+    def claim_tweet_url(self, url: str) -> bool:
+        status_id = parse_status_id(url)
+        if status_id is not None and self.in_history(status_id, url):
+            return False
+        return self.claim_url(url, self.processed_tweet_ids)
+
+    def claim_comment_url(self, url: str) -> bool:
+        status_id = parse_status_id(url)
+        if status_id is not None and self.in_history(status_id, url):
+            return False
+        return self.claim_url(url, self.processed_comment_ids)
+
+    def replies_to_fetch(self, tweet: Tweet) -> int:
+        """How many replies are worth opening tweet's thread for; 0 to skip it.
+
+        A thread crawled by an earlier run is only reopened once its reply
+        count grew by at least reply_growth, and then only for the new
+        replies. Each thread is opened at most once per run.
+        """
+        if tweet.replies <= 0:
+            return 0
+        fetch = tweet.replies
+        thread = None
+        if self.index is not None:
+            thread = self.index.reply_thread(tweet.tweet_url)
+            if thread is not None:
+                fetch = tweet.replies - thread["reply_count"]
+                if fetch < self.reply_growth:
+                    self.metrics.increment("reply_threads_unchanged")
+                    return 0
+        if not self.claim_url(tweet.tweet_url, self.processed_thread_ids):
+            return 0
+        if thread is not None:
+            self.metrics.increment("reply_threads_reopened")
+        return fetch
+
+    def start_run(self):
+        """Forget the reply threads opened by an earlier run of this extractor.
+
+        Long-lived extractors (the job daemon's) crawl many runs; a thread
+        opened in one job may have grown enough to be opened again in the next.
+        """
+        self.processed_thread_ids = StatusIdSet()
+
+    def session(self, driver) -> SearcherDriver:
+        """driver's SearcherDriver, shared with the Browser that started it"""
+        return SearcherDriver.for_driver(driver, metrics=self.metrics)
+
+    def element_fields(self, tweet_element) -> Dict[str, Optional[Dict]]:
+        """Read every tweet field inside tweet_element in one script call"""
+        return self.session(tweet_element.parent).read(
+            TWEET_FIELDS, root=tweet_element, attributes=FIELD_ATTRIBUTES
+        )
 
-    def extract_username(self, tweet_element):
+    def extract_username(self, tweet_element, fields=None):
         try:
+            fields = fields or self.element_fields(tweet_element)
+            if not fields[USERNAME]:
+                return None
             # Get username with @ symbol from second span
-            username = tweet_element.find_element(
-                By.CSS_SELECTOR,
-                '[data-testid="User-Name"] div.css-175oi2r.r-1ez5h0i div.r-1wbh5a2 span',
-            ).text
+            username = fields[USERNAME]["text"]
 
             logging.debug(f"Raw username found: {username}")
 
@@ -52,84 +372,281 @@ class TweetExtractor:
                 logging.warning(f"Invalid username format: {username}")
                 return None
 
+        except SelectorMissError:
+            raise
         except Exception as e:
             logging.error(f"Error extracting username: {e}")
             return None
 
-    def extract_tweet_data(self, tweet_element):
+    def extract_tweet_data(self, tweet_element, fields=None):
         try:
+            fields = fields or self.element_fields(tweet_element)
+
             # Get username
-            username = self.extract_username(tweet_element)
+            username = self.extract_username(tweet_element, fields)
             if not username:
                 return None
 
             # Get tweet URL and timestamp
-            tweet_link = tweet_element.find_element(
-                By.CSS_SELECTOR,
-                '[data-testid="User-Name"] div.css-175oi2r.r-18u37iz.r-1q142lx a[role="link"]',
-            )
-            tweet_url = f"{tweet_link.get_attribute('href')}"
+            tweet_url = self.extract_tweet_url(tweet_element, fields)
+            if not tweet_url or not fields[TWEET_TEXT]:
+                return None
 
             # Get original timestamp
-            timestamp = tweet_element.find_element(
-                By.CSS_SELECTOR, "time[datetime]"
-            ).get_attribute("datetime")
+            timestamp = fields[TIMESTAMP]["attributes"]["datetime"]
 
             # Current collection time
             collection_time = datetime.now().isoformat()
 
             return Tweet(
                 username=username,
-                text=tweet_element.find_element(
-                    By.CSS_SELECTOR, '[data-testid="tweetText"]'
-                ).text,
+                text=fields[TWEET_TEXT]["text"],
                 tweet_url=tweet_url,
                 timestamp=timestamp,
                 collection_time=collection_time,
-                engagement=self.extract_metrics(tweet_element),
+                engagement=self.extract_metrics(tweet_element, fields),
             )
 
+        except SelectorMissError:
+            raise
         except Exception as e:
             logging.error(f"Error processing tweet: {e}")
             return None
 
-    def extract_tweet_url(self, tweet_element):
+    def extract_tweet_url(self, tweet_element, fields=None):
         try:
-            # Look for the timestamp link which leads to the actual tweet
-            time_element = tweet_element.find_element(By.CSS_SELECTOR, "time[datetime]")
-            tweet_url = time_element.find_element(
-                By.XPATH, ".."  # Parent element of time
-            ).get_attribute("href")
-
-            return tweet_url
+            fields = fields or self.element_fields(tweet_element)
+            if not fields[TIMESTAMP]:
+                return None
+            # The timestamp link leads to the actual tweet
+            return fields[TIMESTAMP]["link"]
+        except SelectorMissError:
+            raise
         except Exception as e:
             logging.error(f"Error extracting tweet URL: {e}")
             return None
 
-    def extract_metrics(self, tweet_element):
+    def extract_metrics(self, tweet_element, fields=None):
         try:
+            fields = fields or self.element_fields(tweet_element)
+            if not all(fields[name] for name in (REPLIES, RETWEETS, LIKES)):
+                return {}
             return {
-                "replies": tweet_element.find_element(
-                    By.CSS_SELECTOR, '[data-testid="reply"]'
-                ).text,
-                "retweets": tweet_element.find_element(
-                    By.CSS_SELECTOR, '[data-testid="retweet"]'
-                ).text,
-                "likes": tweet_element.find_element(
-                    By.CSS_SELECTOR, '[data-testid="like"]'
-                ).text,
+                "replies": fields[REPLIES]["text"],
+                "retweets": fields[RETWEETS]["text"],
+                "likes": fields[LIKES]["text"],
             }
+        except SelectorMissError:
+            raise
         except Exception as e:
             logging.error(f"Error extracting metrics: {e}")
             return {}
 
+    def extract_visible_tweets(
+        self, driver, container: str = TWEET
+    ) -> Optional[List[Dict]]:
+        """Extract the tweets rendered since the last call in one execute_script.
+
+        Returns None if the script fails or no tweet is rendered yet. Raises
+        SelectorMissError when fields keep going unmatched.
+        """
+        session = self.session(driver)
+        try:
+            payload = driver.execute_script(
+                BATCH_EXTRACT_SCRIPT,
+                session.candidates(container),
+                {name: session.candidates(name) for name in TWEET_FIELDS},
+            )
+            result = json.loads(payload) if payload else {}
+        except Exception as e:
+            logging.error(f"Error running batch extraction: {e}")
+            return None
+        if not result.get("rendered"):
+            return None
+        hits = result.get("hits", {})
+        session.hit(container, hits.pop("container"))
+        session.record(hits, result.get("misses", {}))
+        return result["records"]
+
+    def tweet_from_record(self, record: Dict) -> Optional[Tweet]:
+        username = record.get("username")
+        if not username or "@" not in username:
+            logging.warning(f"Invalid username format: {username}")
+            return None
+
+        if not record.get("tweet_url") or not record.get("timestamp"):
+            logging.error(f"Incomplete tweet record: {record}")
+            return None
+
+        if record.get("text") is None:
+            logging.error(f"Missing tweet text: {record['tweet_url']}")
+            return None
+
+        return Tweet(
+            username=username,
+            text=record["text"],
+            tweet_url=record["tweet_url"],
+            timestamp=record["timestamp"],
+            collection_time=datetime.now().isoformat(),
+            engagement=record.get("engagement") or {},
+        )
+
+    def collect_new_tweets(
+        self,
+        driver,
+        is_seen: Callable[[str], bool],
+        container: str = TWEET,
+        stats: Optional[Dict[str, int]] = None,
+        seen: Optional[List[Tweet]] = None,
+    ) -> List[Tweet]:
+        """Build Tweet objects for rendered tweets for which is_seen(url) is false.
+
+        container names the tweet elements in the selector registry, TWEET or
+        REPLY.
+        Only cells rendered since the previous call, or still incomplete then,
+        are read; the rest were tagged as scanned. Uses one batched script
+        call when batch extraction is enabled and falls back to per-element
+        lookups if the script fails or sees no tweets yet.
+        SelectorMissError is passed on once fields stop matching altogether.
+        When stats is given, candidate and already-seen counts are added to it
+        and batch_ids is set to the status IDs of every rendered tweet.
+        When seen is given, already-seen tweets read by the batched script are
+        appended to it; per-element lookups don't read them at all.
+        """
+        if stats is None:
+            stats = {}
+        stats["batch_ids"] = []
+        new_tweets = []
+        batch_urls = set()
+
+        records = None
+        if self.batch_extraction:
+            records = self.extract_visible_tweets(driver, container)
+
+        if records is not None:
+            for record in records:
+                if not record.get("complete"):
+                    continue  # Still rendering: read again next step
+                tweet_url = record.get("tweet_url")
+                if not tweet_url or tweet_url in batch_urls:
+                    continue
+                stats["candidates"] = stats.get("candidates", 0) + 1
+                stats["batch_ids"].append(parse_status_id(tweet_url))
+                if is_seen(tweet_url):
+                    stats["duplicates"] = stats.get("duplicates", 0) + 1
+                    if seen is not None:
+                        seen_tweet = self.tweet_from_record(record)
+                        if seen_tweet:
+                            seen.append(seen_tweet)
+                    continue
+                tweet_data = self.tweet_from_record(record)
+                if tweet_data:
+                    new_tweets.append(tweet_data)
+                    batch_urls.add(tweet_url)
+            return new_tweets
+
+        session = self.session(driver)
+        if not session.wait_for(container, self.waiter, "tweet_render"):
+            raise TimeoutException(f"No '{container}' elements rendered")
+        tweet_elements = driver.execute_script(
+            UNSCANNED_SCRIPT, session.css(container), session.candidates(TIMESTAMP)
+        )
+        scanned = []
+        for tweet_element in tweet_elements or []:
+            try:
+                fields = session.read(
+                    TWEET_FIELDS, root=tweet_element, attributes=FIELD_ATTRIBUTES
+                )
+                tweet_url = self.extract_tweet_url(tweet_element, fields)
+                if not tweet_url or tweet_url in batch_urls:
+                    continue
+                stats["candidates"] = stats.get("candidates", 0) + 1
+                stats["batch_ids"].append(parse_status_id(tweet_url))
+                if is_seen(tweet_url):
+                    stats["duplicates"] = stats.get("duplicates", 0) + 1
+                    scanned.append(tweet_element)
+                    continue
+                tweet_data = self.extract_tweet_data(tweet_element, fields)
+                if tweet_data:
+                    tweet_data.tweet_url = tweet_url
+                    new_tweets.append(tweet_data)
+                    batch_urls.add(tweet_url)
+                    scanned.append(tweet_element)
+            except SelectorMissError:
+                raise
+            except Exception as e:
+                logging.error(f"Error processing tweet: {e}")
+                continue
+
+        self.mark_scanned(driver, scanned)
+        return new_tweets
+
+    def mark_scanned(self, driver, elements: List):
+        """Tag cells read by per-element lookups so later steps skip them.
+
+        Only pass cells that were read completely; the rest are read again.
+        """
+        if not elements:
+            return
+        try:
+            driver.execute_script(
+                MARK_SCANNED_SCRIPT,
+                elements,
+                self.session(driver).candidates(TIMESTAMP),
+            )
+        except Exception as e:
+            logging.error(f"Error marking scanned tweets: {e}")
+
+    def wait_for_budget(self):
+        """Block until the rate limiter allows another request"""
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+
+    def rate_limit_reason(self, driver) -> Optional[str]:
+        return detect_rate_limit(driver)
+
+    def check_rate_limit(self, driver):
+        """Raise RateLimitError if the page shows a rate limit or load error.
+
+        Only called once a load or scroll came back empty, and only when a
+        rate limiter is set.
+        """
+        if self.rate_limiter is None:
+            return
+        reason = self.rate_limit_reason(driver)
+        if reason:
+            raise RateLimitError(reason)
+
+    def report_rate_limit(self, error: RateLimitError, stats: Optional[Dict] = None):
+        if stats is not None:
+            stats["rate_limited"] = True
+        if self.rate_limiter is not None:
+            self.rate_limiter.report_limit(str(error))
+
     def extract_comments(
-        self, driver, tweet_url: str, min_replies: int = 0
+        self,
+        driver,
+        tweet_url: str,
+        min_replies: int = 0,
+        max_replies: Optional[int] = None,
+        return_to_previous: bool = True,
+        reply_count: Optional[int] = None,
     ) -> List[Dict]:
+        """Collect replies from a tweet's detail page.
+
+        Dedicated comment workers pass return_to_previous=False since they have
+        no search timeline to go back to. Replies collected by earlier runs are
+        skipped, and when reply_count is given the crawl is recorded in the
+        index with it (see replies_to_fetch).
+        """
         comments = []
+        started = time.time()
+        crawled = False
         try:
+            self.wait_for_budget()
             driver.get(tweet_url)
-            time.sleep(5)  # Increased wait for page load
+            if not self.session(driver).wait_for(TWEET, self.waiter, "tweet_page_load"):
+                self.check_rate_limit(driver)
 
             # Verify we're on the tweet detail page
             if not tweet_url in driver.current_url:
@@ -138,175 +655,322 @@ class TweetExtractor:
 
             # Check for replies section
             try:
-                reply_section = WebDriverWait(driver, 10).until(
-                    EC.presence_of_all_elements_located(
-                        (
-                            By.CSS_SELECTOR,
-                            'div[data-testid="cellInnerDiv"]:not(:first-child) article[data-testid="tweet"]',
-                        )
-                    )
+                reply_section = self.session(driver).wait_for(
+                    REPLY, self.waiter, "reply_section"
                 )
 
                 if not reply_section:
                     logging.debug(f"No reply section found for tweet: {tweet_url}")
+                    crawled = True
                     return comments
 
-                last_height = driver.execute_script("return document.body.scrollHeight")
                 scroll_attempts = 0
+                comment_stats = {}
                 max_scrolls = 5  # Increased max scrolls
 
                 while scroll_attempts < max_scrolls:
+                    if max_replies is not None and len(comments) >= max_replies:
+                        break
+
                     # Process visible replies
-                    reply_tweets = driver.find_elements(
-                        By.CSS_SELECTOR,
-                        'div[data-testid="cellInnerDiv"]:not(:first-child) article[data-testid="tweet"]',
+                    new_comments = self.collect_new_tweets(
+                        driver,
+                        self.is_processed_comment,
+                        REPLY,
+                        stats=comment_stats,
                     )
 
-                    for reply in reply_tweets:
-                        try:
-                            comment_url = self.extract_tweet_url(reply)
-                            if (
-                                comment_url
-                                and comment_url not in self.processed_comment_urls
-                            ):
-                                comment_data = self.extract_tweet_data(reply)
-                                if comment_data:
-                                    comment_data.parent_tweet_url = tweet_url
-                                    comments.append(comment_data)
-                                    self.processed_comment_urls.add(comment_url)
-                                    logging.info(
-                                        f"Extracted comment {comment_url} for tweet {tweet_url}"
-                                    )
-                        except Exception as e:
-                            logging.error(f"Error processing comment: {e}")
+                    for comment_data in new_comments:
+                        if not self.claim_comment_url(comment_data.tweet_url):
                             continue
+                        comment_data.parent_tweet_url = tweet_url
+                        comments.append(comment_data)
+                        if max_replies is not None and len(comments) >= max_replies:
+                            break
+                        logging.info(
+                            f"Extracted comment {comment_data.tweet_url} for tweet {tweet_url}"
+                        )
 
-                    # Scroll down
-                    driver.execute_script(
-                        "window.scrollTo(0, document.body.scrollHeight);"
-                    )
-                    time.sleep(3)  # Increased scroll wait
-
-                    new_height = driver.execute_script(
-                        "return document.body.scrollHeight"
+                    # Scroll down and wait for more replies to render
+                    scroll = {}
+                    new_content = self.waiter.scroll_and_wait(
+                        driver, self.session(driver).css(REPLY), "reply_scroll", scroll
                     )
-                    if new_height == last_height:
-                        scroll_attempts += 1
-                    else:
+                    if scroll.get("fetched"):
+                        self.wait_for_budget()
+                    if new_content:
                         scroll_attempts = 0  # Reset counter if new content found
-                    last_height = new_height
+                    else:
+                        self.metrics.increment("comment_empty_scrolls")
+                        scroll_attempts += 1
+                        self.check_rate_limit(driver)
 
                 logging.info(
                     f"Extracted {len(comments)} comments from tweet: {tweet_url}"
                 )
+                crawled = True
 
+            except RateLimitError:
+                raise
             except Exception as e:
                 logging.error(f"Error extracting comments: {e}")
 
+        except RateLimitError as e:
+            self.report_rate_limit(e)
         except Exception as e:
             logging.error(f"Error accessing tweet: {e}")
         finally:
+            if crawled and reply_count is not None and self.index is not None:
+                self.index.record_reply_thread(tweet_url, reply_count, len(comments))
             # Return to search results
-            driver.back()
-            time.sleep(3)
+            if return_to_previous:
+                driver.back()
+                self.session(driver).wait_for(TWEET, self.waiter, "search_restore")
+            self.metrics.observe("comments", time.time() - started)
+            self.metrics.increment("comment_threads")
+            self.metrics.increment("comments_collected", len(comments))
+
+        return comments
+
+    def crawl_replies(self, driver, tweet: Tweet, comment_queue=None) -> List[Tweet]:
+        """Queue or open tweet's reply thread if replies_to_fetch allows it.
 
+        Returns the replies collected in place, tagged with the tweet's URL
+        and keyword.
+        """
+        fetch = self.replies_to_fetch(tweet)
+        if not fetch:
+            return []
+        if comment_queue is not None:
+            comment_queue.enqueue(tweet.tweet_url, tweet.keyword, tweet.replies, fetch)
+            return []
+        comments = self.extract_comments(
+            driver, tweet.tweet_url, max_replies=fetch, reply_count=tweet.replies
+        )
+        for comment in comments:
+            comment.parent_tweet_url = tweet.tweet_url
+            comment.keyword = tweet.keyword
         return comments
 
-    def search_and_extract(self, driver, keyword, target_tweets=100, timeout=300):
+    def flush_batch(
+        self, tweets: List[Tweet], on_tweets: Optional[Callable[[List[Tweet]], None]]
+    ) -> List[Tweet]:
+        """Hand tweets to on_tweets, returning what the caller should keep"""
+        if on_tweets is None or not tweets:
+            return tweets
+        on_tweets(tweets)
+        return []
+
+    def search_and_extract(
+        self,
+        driver,
+        keyword,
+        target_tweets=100,
+        timeout=300,
+        on_tweets=None,
+        comment_queue=None,
+        query=None,
+        raise_session_errors=False,
+        attribute=None,
+        stats=None,
+        stop_below=None,
+        keywords=None,
+    ):
+        """Search keyword and collect new tweets and their replies.
+
+        When on_tweets is given, every scroll step's tweets are passed to it as
+        soon as they are extracted and are not kept, so the returned list only
+        holds tweets collected without a callback. When comment_queue is given,
+        tweets with replies are queued on it instead of being opened in place.
+        query overrides the search text while tweets stay attributed to keyword,
+        or to attribute(tweet) when given; search results are recorded for
+        each of keywords (default [keyword]) with the tweets attributed to
+        it. A stats dict, if passed, is filled
+        with the scroll counters and whether target_tweets was reached.
+        With stop_below, scrolling stops once every tweet a scroll step
+        revealed is at or below that status ID; on the live timeline everything
+        further down is older still (mark_reached is set in stats). timed_out
+        is set in stats when the search ran out of time before its target.
+        With raise_session_errors, a dead driver session is re-raised after
+        being recorded instead of only being logged.
+        """
         tweets = []
+        collected = 0
         start_time = time.time()
         no_new_content_count = 0
-        last_height = 0
-        processed_urls_count = len(self.processed_tweet_urls)
+        new_urls_found = 0
+        # New tweets by the keyword they were attributed to
+        found: Dict[str, int] = {}
+        if stats is None:
+            stats = {}
+        stats.update(candidates=0, duplicates=0, scrolls=0, empty_scrolls=0)
+        stats["mark_reached"] = False
+        stats["timed_out"] = False
+        encountered_ids = set()
+        seen = []
+        calls_before = self.metrics.driver_calls(driver)
 
         try:
-            encoded_query = urllib.parse.quote(keyword)
+            encoded_query = urllib.parse.quote(query or keyword)
             search_url = (
-                f"https://twitter.com/search?q={encoded_query}&src=typed_query&f=live"
+                f"{self.base_url}/search?q={encoded_query}&src=typed_query&f=live"
             )
 
-            logging.info(f"Starting search for keyword: {keyword}")
+            logging.info(f"Starting search for keyword: {query or keyword}")
+            self.wait_for_budget()
             driver.get(search_url)
-            time.sleep(5)  # Increased initial wait
-
-            while len(tweets) < target_tweets and (time.time() - start_time) < timeout:
-                tweet_elements = WebDriverWait(driver, 10).until(
-                    EC.presence_of_all_elements_located(
-                        (By.CSS_SELECTOR, 'article[data-testid="tweet"]')
-                    )
-                )
-
-                if not tweet_elements:
-                    logging.info(f"No tweets found for keyword: {keyword}")
+            rendered = self.session(driver).wait_for(
+                TWEET, self.waiter, "search_load"
+            )
+            if not rendered:
+                self.check_rate_limit(driver)
+                # Not throttled: the search (e.g. an empty date window) has no
+                # tweets, which is a result rather than a failure
+                logging.info(f"No tweets rendered for '{keyword}'")
+
+            while rendered and collected < target_tweets:
+                if time.time() - start_time >= timeout:
+                    stats["timed_out"] = True
+                    logging.warning(f"Search for '{keyword}' timed out")
                     break
+                new_tweets = self.collect_new_tweets(
+                    driver, self.is_processed_tweet, stats=stats, seen=seen
+                )
 
-                for tweet_element in tweet_elements:
+                for tweet_data in new_tweets:
                     try:
-                        tweet_url = self.extract_tweet_url(tweet_element)
-                        if not tweet_url:
+                        tweet_url = tweet_data.tweet_url
+                        if not self.claim_tweet_url(tweet_url):
+                            stats["duplicates"] += 1
                             continue
+                        new_urls_found += 1
+                        # Track source keyword
+                        tweet_data.keyword = (
+                            attribute(tweet_data) if attribute else keyword
+                        )
+                        found[tweet_data.keyword] = found.get(tweet_data.keyword, 0) + 1
+                        tweets.append(tweet_data)
+                        collected += 1
+
+                        # Extract comments if tweet has replies
+                        comments = self.crawl_replies(
+                            driver, tweet_data, comment_queue
+                        )
+                        tweets.extend(comments)
+                        collected += len(comments)
 
-                        if tweet_url not in self.processed_tweet_urls:
-                            tweet_data = self.extract_tweet_data(tweet_element)
-                            if tweet_data:
-                                tweet_data.keyword = keyword  # Track source keyword
-                                tweets.append(tweet_data)
-                                self.processed_tweet_urls.add(tweet_url)
-
-                                # Extract comments if tweet has replies
-                                engagement = self.extract_metrics(tweet_element)
-                                if (
-                                    engagement.get("replies")
-                                    and engagement["replies"] != "0"
-                                ):
-                                    comments = self.extract_comments(driver, tweet_url)
-                                    if comments:
-                                        for comment in comments:
-                                            comment.parent_tweet_url = tweet_url
-                                            comment.keyword = keyword
-                                        tweets.extend(comments)
-
-                                logging.info(f"Processed tweet: {tweet_url}")
+                        logging.info(f"Processed tweet: {tweet_url}")
 
                     except Exception as e:
                         logging.error(f"Error processing tweet: {e}")
                         continue
 
+                # Tweets collected before whose threads gained replies since
+                for seen_tweet in seen:
+                    try:
+                        seen_tweet.keyword = (
+                            attribute(seen_tweet) if attribute else keyword
+                        )
+                        comments = self.crawl_replies(
+                            driver, seen_tweet, comment_queue
+                        )
+                        tweets.extend(comments)
+                        collected += len(comments)
+                    except Exception as e:
+                        logging.error(f"Error reopening reply thread: {e}")
+                seen.clear()
+
+                tweets = self.flush_batch(tweets, on_tweets)
+
+                if stop_below is not None:
+                    revealed = {
+                        status_id
+                        for status_id in stats.get("batch_ids", [])
+                        if status_id and status_id not in encountered_ids
+                    }
+                    encountered_ids.update(revealed)
+                    if revealed and max(revealed) <= stop_below:
+                        stats["mark_reached"] = True
+                        logging.info(f"Reached earlier tweets for '{keyword}'")
+                        break
+
                 # Scroll handling
-                current_height = driver.execute_script(
-                    "return document.body.scrollHeight"
+                stats["scrolls"] += 1
+                scroll = {}
+                new_content = self.waiter.scroll_and_wait(
+                    driver, self.session(driver).css(TWEET), "search_scroll", scroll
                 )
-                if current_height == last_height:
+                # Only scrolls that made the site fetch more use the budget;
+                # the next request waits for the one this took
+                if scroll.get("fetched"):
+                    self.wait_for_budget()
+                if new_content:
+                    no_new_content_count = 0
+                else:
+                    stats["empty_scrolls"] += 1
                     no_new_content_count += 1
+                    self.check_rate_limit(driver)
                     if no_new_content_count >= 3:  # 3 attempts without new content
                         break
-                else:
-                    no_new_content_count = 0
-
-                last_height = current_height
-                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(3)  # Increased scroll wait
 
             # Track search results
-            new_urls_found = len(self.processed_tweet_urls) - processed_urls_count
+            self.record_search_results(keywords or [keyword], found)
             if new_urls_found > 0:
-                self.search_results["successful"].append(
-                    {"keyword": keyword, "tweets_found": new_urls_found}
-                )
                 logging.info(f"Found {new_urls_found} new tweets for '{keyword}'")
             else:
-                self.search_results["failed"].append(
-                    {"keyword": keyword, "reason": "No new tweets found"}
-                )
                 logging.warning(f"No new tweets found for '{keyword}'")
+            if self.rate_limiter is not None:
+                self.rate_limiter.report_success()
 
             return tweets
 
+        except RateLimitError as e:
+            logging.warning(f"Rate limited while searching for '{keyword}': {e}")
+            stats["error"] = str(e)
+            self.report_rate_limit(e, stats)
+            self.record_search_results(
+                keywords or [keyword], found, f"Rate limited: {e}"
+            )
+            return self.flush_batch(tweets, on_tweets)
+
         except Exception as e:
             logging.error(f"Error searching for '{keyword}': {e}")
-            self.search_results["failed"].append({"keyword": keyword, "reason": str(e)})
+            stats["error"] = str(e)
+            self.record_search_results(keywords or [keyword], found, str(e))
+            tweets = self.flush_batch(tweets, on_tweets)
+            if raise_session_errors and is_session_error(e):
+                raise
             return tweets
 
+        finally:
+            elapsed = time.time() - start_time
+            stats["target_reached"] = collected >= target_tweets
+            self.metrics.observe("search", elapsed)
+            self.metrics.record_keyword(
+                keyword,
+                tweets=collected,
+                seconds=elapsed,
+                candidates=stats["candidates"],
+                duplicates=stats["duplicates"],
+                empty_scrolls=stats["empty_scrolls"],
+                scrolls=stats["scrolls"],
+                webdriver_calls=self.metrics.driver_calls(driver) - calls_before,
+            )
+
+    def record_search_results(
+        self, keywords: List[str], found: Dict[str, int], error: Optional[str] = None
+    ):
+        """Add one search's outcome for each keyword it covered"""
+        for keyword in keywords:
+            if found.get(keyword):
+                self.search_results["successful"].append(
+                    {"keyword": keyword, "tweets_found": found[keyword]}
+                )
+            else:
+                self.search_results["failed"].append(
+                    {"keyword": keyword, "reason": error or NO_RESULTS_REASON}
+                )
+
     def save_search_results(self):
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         results_file = os.path.join(
@@ -1,49 +1,658 @@
+from src.extractors.comment_crawler import CommentCrawler
+from src.extractors.network_extractor import NetworkTweetExtractor
 from src.extractors.tweet_extractor import TweetExtractor
-from src.savers.tweet_saver import TweetSaver
+from src.savers.compactor import (
+    DEFAULT_ARCHIVE_DIR,
+    DEFAULT_STORE_PATH,
+    OutputCompactor,
+)
+from src.savers.near_duplicate_index import (
+    DEFAULT_SIGNATURE_PATH,
+    LINK,
+    NearDuplicateIndex,
+)
+from src.savers.partitioned_store import DEFAULT_DATASET_ROOT, PartitionedTweetSaver
+from src.savers.tweet_index import TweetIndex, DEFAULT_INDEX_PATH
+from src.savers.tweet_saver import StreamingTweetSaver, TweetSaver
 from src.utils.browser import Browser
+from src.utils.browser_pool import BrowserPool
+from src.utils.browser_supervisor import BrowserSupervisor, SessionUnavailableError
+from src.utils.checkpoint import RunCheckpoint
+from src.utils.config import load_config
+from src.utils.job_queue import DEFAULT_JOBS_DIR, QUEUED, JobQueue, JobServer
+from src.utils.metrics import RunMetrics
+from src.utils.query_planner import (
+    DEFAULT_DENSITY_PATH,
+    QueryPlanner,
+    load_densities,
+    save_densities,
+)
+from src.utils.scheduler import RateLimitScheduler, historical_yields, order_by_yield
+from src.utils.status_ids import EXACT
+from src.utils.waits import AdaptiveWaiter
 import logging
 from datetime import datetime
 import os
+import threading
+import time
+from typing import Callable, Optional
 
 
-def main():
-    browser = None
+def configure_logging():
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+
+
+class CrawlResources:
+    """The parts of a crawl that outlive a single run.
+
+    The index, the extractor with its dedup state, the wait timings and the
+    browser sessions are shared by every run crawled with them, so a daemon
+    pays for Chrome startup, login and history loading only once. Sessions
+    are started on first use.
+    """
+
+    def __init__(self, config: dict, metrics: RunMetrics):
+        self.config = config
+        self.metrics = metrics
+        self.browser = None
+        self.pool = None
+        self.comment_pool = None
+        self.index = None
+        self.near_duplicates = None
+        self.pool_size = config.get("pool_size", 1)
+        self.browser_settings = config.get("browser_settings", {})
+        self.target_tweets = self.browser_settings.get("tweets_per_keyword", 100)
+        wait_settings = config.get("waits", {})
+        self.waiter = AdaptiveWaiter(
+            max_wait=wait_settings.get("max_wait", 10.0),
+            quiet_period=wait_settings.get("quiet_period", 0.3),
+            scroll_step=wait_settings.get("scroll_step", 0.9),
+        )
+        self.index = TweetIndex(config.get("index_file", DEFAULT_INDEX_PATH))
+        self.capture_network = config.get("extractor", "dom") == "network"
+        self.rate_limit = config.get("rate_limit", {})
+        rate_limiter = None
+        if self.rate_limit.get("enabled", False):
+            rate_limiter = RateLimitScheduler(
+                requests_per_minute=self.rate_limit.get("requests_per_minute", 30),
+                burst=self.rate_limit.get("burst", 10),
+                backoff_base=self.rate_limit.get("backoff_base", 30),
+                backoff_max=self.rate_limit.get("backoff_max", 900),
+                metrics=metrics,
+            )
+        extractor_class = (
+            NetworkTweetExtractor if self.capture_network else TweetExtractor
+        )
+        dedup_settings = config.get("dedup", {})
+        self.extractor = extractor_class(
+            index=self.index,
+            waiter=self.waiter,
+            metrics=metrics,
+            rate_limiter=rate_limiter,
+            history=dedup_settings.get("history", EXACT),
+            false_positive_rate=dedup_settings.get("false_positive_rate", 0.001),
+            reply_growth=config.get("comments", {}).get("reply_growth", 5),
+        )
+        self.saver = TweetSaver(index=self.index, metrics=metrics)
+        self.duplicate_settings = config.get("near_duplicates", {})
+        if self.duplicate_settings.get("enabled", False):
+            self.near_duplicates = NearDuplicateIndex(
+                self.duplicate_settings.get("index_file", DEFAULT_SIGNATURE_PATH),
+                threshold=self.duplicate_settings.get("threshold", 0.5),
+                min_tokens=self.duplicate_settings.get("min_tokens", 5),
+                metrics=metrics,
+            )
+        supervisor_settings = config.get("supervisor", {})
+        self.supervisor = BrowserSupervisor(
+            recycle_every=supervisor_settings.get("recycle_every", 50),
+            max_memory_mb=supervisor_settings.get("max_memory_mb", 2048),
+            metrics=metrics,
+        )
+
+    def search_sessions(self):
+        """Run task(browser, item) over next_item() on the search sessions"""
+        if self.pool_size > 1:
+            if self.pool is None:
+                self.pool = BrowserPool(
+                    self.pool_size,
+                    waiter=self.waiter,
+                    capture_network=self.capture_network,
+                    metrics=self.metrics,
+                    settings=self.browser_settings,
+                )
+                self.pool.start()
+            return self.pool.run_until_done
+
+        if self.browser is None:
+            self.browser = Browser(
+                waiter=self.waiter,
+                capture_network=self.capture_network,
+                metrics=self.metrics,
+                settings=self.browser_settings,
+            )
+
+        def run_until_done(next_item, task, busy=None):
+            # One session: nothing else is running once next_item() runs dry
+            while True:
+                item = next_item()
+                if item is None:
+                    break
+                task(self.browser, item)
+
+        return run_until_done
+
+    def comment_sessions(self) -> list:
+        workers = self.config.get("comments", {}).get("workers", 0)
+        if workers > 0 and self.comment_pool is None:
+            self.comment_pool = BrowserPool(
+                workers,
+                waiter=self.waiter,
+                capture_network=self.capture_network,
+                metrics=self.metrics,
+                settings=self.browser_settings,
+                name="comments",
+            )
+            self.comment_pool.start()
+        return self.comment_pool.browsers if self.comment_pool else []
+
+    def close(self):
+        if self.browser:
+            self.browser.close()
+        if self.pool:
+            self.pool.close()
+        if self.comment_pool:
+            self.comment_pool.close()
+        if self.index:
+            self.index.close()
+        if self.near_duplicates:
+            self.near_duplicates.close()
+
+
+def main(resume: bool = False, checkpoint_path: Optional[str] = None):
+    resources = None
+    metrics = RunMetrics()
+    config = {}
+    run_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     try:
         # Configure logging
-        logging.basicConfig(
-            level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
-        )
+        configure_logging()
 
         # Initialize components
-        browser = Browser()
-        extractor = TweetExtractor()
-        saver = TweetSaver()
+        config = load_config()
+        resources = CrawlResources(config, metrics)
 
-        # Get keywords from file
-        keywords = extractor.parse_keywords("config/keywords.txt")
-        all_tweets = []
+        checkpoint = None
+        if resume:
+            if checkpoint_path:
+                checkpoint = RunCheckpoint.load(checkpoint_path)
+            else:
+                checkpoint = RunCheckpoint.latest_unfinished()
+            if checkpoint:
+                logging.info(f"Resuming run from {checkpoint.path}")
+            else:
+                logging.warning("No unfinished checkpoint found, starting a new run")
 
-        # Extract tweets for each keyword
-        for keyword in keywords:
-            tweets = extractor.search_and_extract(browser.driver, keyword)
-            if tweets:
-                all_tweets.extend(tweets)
+        # Get keywords from file, or from the run being resumed
+        if checkpoint:
+            keywords = list(checkpoint.state["keywords"])
+        else:
+            keywords = resources.extractor.parse_keywords(
+                config.get("keyword_file", "config/keywords.txt")
+            )
+        run_crawl(resources, keywords, checkpoint=checkpoint, timestamp=run_timestamp)
 
-        # Save tweets with timestamp
-        if all_tweets:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    except Exception as e:
+        logging.error(f"Error in main: {e}")
+        raise
+    finally:
+        if resources:
+            resources.close()
+        export_metrics(
+            metrics, resources.waiter if resources else None, config, run_timestamp
+        )
+
+
+def run_crawl(
+    resources: CrawlResources,
+    keywords: list,
+    target_tweets: Optional[int] = None,
+    targets: Optional[dict] = None,
+    checkpoint: Optional[RunCheckpoint] = None,
+    timestamp: Optional[str] = None,
+    on_checkpoint: Optional[Callable[[RunCheckpoint], None]] = None,
+) -> dict:
+    """Crawl keywords with the given resources, resuming checkpoint if given.
+
+    target_tweets defaults to tweets_per_keyword and targets overrides it per
+    keyword. on_checkpoint is called with the run's checkpoint once it
+    exists. Returns a summary of the run.
+    """
+    config = resources.config
+    extractor = resources.extractor
+    index = resources.index
+    near_duplicates = resources.near_duplicates
+    waiter = resources.waiter
+    comment_crawler = None
+    stream = None
+    # Writes buffered tweets before progress is recorded, if the saver buffers
+    flush_output = None
+    planner = None
+    all_tweets = []
+    output_file = None
+    collected = [0]
+    collected_lock = threading.Lock()
+    started = time.time()
+    timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+    if target_tweets is None:
+        target_tweets = resources.target_tweets
+    try:
+        streaming = config.get("streaming_output", False)
+        partitioned = config.get("partitioned_output", {})
+
+        if partitioned.get("enabled", False):
+            # Compressed NDJSON partitioned by keyword and tweet date; a
+            # resumed run adds its own files to the same dataset
+            output_file = partitioned.get("root", DEFAULT_DATASET_ROOT)
+            stream = PartitionedTweetSaver(
+                output_file,
+                run_id=timestamp,
+                index=index,
+                row_group_size=partitioned.get("row_group_size", 500),
+                max_buffered_rows=partitioned.get("max_buffered_rows", 5000),
+                metrics=resources.metrics,
+            )
+            save_tweets = stream.write
+            flush_output = stream.flush
+        elif streaming:
+            # Tweets are appended to disk as they arrive instead of held in memory.
+            # A resumed run keeps appending to the same file.
+            output_file = os.path.join("data", "output", f"tweets_{timestamp}.ndjson")
+            if checkpoint and (checkpoint.output_file or "").endswith(".ndjson"):
+                output_file = checkpoint.output_file
+            stream = StreamingTweetSaver(
+                output_file,
+                index=index,
+                fsync_every=config.get("fsync_every", 100),
+                metrics=resources.metrics,
+            )
+            save_tweets = stream.write
+        else:
             output_file = os.path.join("data", "output", f"tweets_{timestamp}.json")
-            saver.save_to_json(all_tweets, output_file)
+            tweets_lock = threading.Lock()
+
+            def save_tweets(tweets):
+                with tweets_lock:
+                    all_tweets.extend(tweets)
+
+        if checkpoint is None:
+            checkpoint = RunCheckpoint.create(keywords, output_file)
+        if on_checkpoint:
+            on_checkpoint(checkpoint)
+        extractor.start_run()
+        extractor.search_results = checkpoint.search_results
+
+        def on_tweets(tweets):
+            if near_duplicates:
+                tweets = near_duplicates.filter(
+                    tweets, resources.duplicate_settings.get("mode", LINK)
+                )
+                if not tweets:
+                    return
+            save_tweets(tweets)
+            with collected_lock:
+                collected[0] += len(tweets)
+            # A merged query's batch can hold tweets of several keywords
+            by_keyword = {}
+            for tweet in tweets:
+                by_keyword.setdefault(tweet.keyword, []).append(tweet)
+            for keyword, keyword_tweets in by_keyword.items():
+                checkpoint.record_tweets(keyword, keyword_tweets)
+
+        # Replies are crawled on their own sessions while the search runs
+        comment_settings = config.get("comments", {})
+        comment_browsers = resources.comment_sessions()
+        if comment_browsers:
+            comment_crawler = CommentCrawler(
+                extractor,
+                comment_browsers,
+                on_tweets,
+                queue_depth=comment_settings.get("queue_depth", 100),
+                max_replies=comment_settings.get("max_replies", 50),
+                supervisor=resources.supervisor,
+            )
+            comment_crawler.start()
+
+        pending_comments = checkpoint.state.get("pending_comments", [])
+        if pending_comments:
+            if comment_crawler:
+                # Checkpoints from before reply counts were queued hold pairs
+                for item in pending_comments:
+                    comment_crawler.enqueue(*item)
+            else:
+                logging.warning(
+                    f"Skipping {len(pending_comments)} pending reply threads: "
+                    "no comment workers configured"
+                )
+
+        completed = [k for k in keywords if checkpoint.is_completed(k)]
+        if completed:
+            logging.info(f"Skipping {len(completed)} keywords completed earlier")
+        keywords = [k for k in keywords if not checkpoint.is_completed(k)]
+        if resources.rate_limit.get("order_by_yield", False):
+            # Keywords that found the most in past runs get the request budget first
+            yields = historical_yields(
+                store_path=config.get("compaction", {}).get(
+                    "store_file", DEFAULT_STORE_PATH
+                )
+            )
+            keywords = order_by_yield(keywords, yields)
+        planner = build_planner(
+            config, keywords, target_tweets, checkpoint, index, targets=targets
+        )
+
+        def record_plan(finished):
+            marks = planner.high_water_marks(finished)
+            for keyword, mark in marks.items():
+                index.update_high_water_mark(
+                    keyword, mark["status_id"], mark["timestamp"]
+                )
+            # The plan resumes below tweets shards saw; they must be on disk
+            if flush_output:
+                flush_output()
+            for keyword in finished:
+                checkpoint.complete_keyword(keyword)
+            checkpoint.set_planner_state(planner.to_dict())
+
+        def crawl_shard(browser, shard):
+            for keyword in shard.keywords:
+                checkpoint.start_keyword(keyword)
+
+            def on_shard_tweets(tweets):
+                on_tweets(tweets)
+                shard.observe(tweets)
+
+            stats = {}
+            try:
+                extractor.search_and_extract(
+                    browser.driver,
+                    shard.label,
+                    target_tweets=shard.target,
+                    on_tweets=on_shard_tweets,
+                    comment_queue=comment_crawler,
+                    query=shard.query,
+                    raise_session_errors=True,
+                    attribute=shard.attribute,
+                    stats=stats,
+                    stop_below=shard.stop_below,
+                    keywords=shard.keywords,
+                )
+            except Exception:
+                record_plan(planner.fail(shard))
+                raise
+            if "error" in stats:
+                # Rate-limited shards wait out the cooldown and are retried
+                record_plan(
+                    planner.fail(shard, penalize=not stats.get("rate_limited"))
+                )
+            else:
+                record_plan(
+                    planner.complete(
+                        shard,
+                        stats["target_reached"],
+                        stats["mark_reached"],
+                        stats["timed_out"],
+                    )
+                )
+
+        # Extract tweets for each keyword, one shard at a time per session.
+        # Sessions are recycled periodically and after a crash; a crashed
+        # shard is queued again and resumes below its oldest tweet.
+        run_until_done = resources.search_sessions()
+        supervised = resources.supervisor.wrap(crawl_shard)
+
+        def run_shard(browser, shard):
+            try:
+                supervised(browser, shard)
+            except SessionUnavailableError:
+                # The shard never started; hand it to the next free session
+                record_plan(planner.fail(shard))
+                raise
+
+        run_until_done(planner.next_shard, run_shard, planner.has_running)
+        if planner.abandoned:
+            logging.warning(
+                f"Gave up on {len(planner.abandoned)} searches; their keywords "
+                f"stay unfinished and --resume tries them again"
+            )
+
+        if comment_crawler:
+            comment_crawler.join()
+            comment_crawler = None
 
         # Save search results status
         extractor.save_search_results()
 
-    except Exception as e:
-        logging.error(f"Error in main: {e}")
+        if all(checkpoint.is_completed(k) for k in checkpoint.state["keywords"]):
+            checkpoint.finish()
+
+        for name, stats in waiter.summary().items():
+            logging.info(
+                f"Wait '{name}': {stats['count']} waits, "
+                f"mean {stats['mean']}s, max {stats['max']}s"
+            )
+
+        return {
+            "checkpoint": checkpoint.path,
+            "output_file": output_file,
+            "finished": bool(checkpoint.state.get("finished")),
+            "tweets": collected[0],
+            "seconds": round(time.time() - started, 3),
+        }
+
+    finally:
+        # Save tweets with timestamp, including what an interrupted run collected
+        if all_tweets:
+            resources.saver.save_to_json(all_tweets, output_file)
+        if planner:
+            save_densities(planner.densities, planner_density_file(config))
+        if checkpoint and not checkpoint.state.get("finished"):
+            if planner:
+                checkpoint.set_planner_state(planner.to_dict())
+            if comment_crawler:
+                checkpoint.set_pending_comments(comment_crawler.pending())
+            checkpoint.save()
+            logging.info("Run can be resumed with: python run.py --resume")
+        if comment_crawler:
+            # Pending threads are in the checkpoint; free the workers
+            comment_crawler.stop()
+        if stream:
+            stream.close()
+
+
+def serve():
+    """Crawl jobs from the job queue on warm browser sessions until stopped"""
+    configure_logging()
+    config = load_config()
+    settings = config.get("daemon", {})
+    metrics = RunMetrics()
+    jobs = JobQueue(settings.get("jobs_dir", DEFAULT_JOBS_DIR))
+    jobs.recover()
+    resources = None
+    server = None
+    try:
+        resources = CrawlResources(config, metrics)
+        # Start and log in every session before the first job arrives
+        resources.comment_sessions()
+        resources.search_sessions()
+        if settings.get("http_port"):
+            server = JobServer(jobs, settings["http_port"])
+            server.start()
+        jobs.save_status()
+        logging.info(f"Watching {os.path.join(jobs.root, QUEUED)} for crawl jobs")
+        while True:
+            job = jobs.next_job()
+            if job is None:
+                time.sleep(settings.get("poll_interval", 5))
+                continue
+            # Each job gets its own report rather than the daemon's running total
+            metrics.reset()
+            resources.waiter.reset()
+            run_job(resources, jobs, job)
+            export_metrics(
+                metrics,
+                resources.waiter,
+                config,
+                datetime.now().strftime("%Y%m%d_%H%M%S"),
+            )
+    except KeyboardInterrupt:
+        logging.info("Stopping crawl daemon")
+    finally:
+        if server:
+            server.stop()
+        if resources:
+            resources.close()
+
+
+def run_job(resources: CrawlResources, jobs: JobQueue, job: dict):
+    """Crawl one queued job, resuming its run if an earlier daemon was cut off"""
+    logging.info(f"Starting job {job['id']} with {len(job['keywords'])} keywords")
+    checkpoint = None
+    if job.get("checkpoint") and os.path.exists(job["checkpoint"]):
+        checkpoint = RunCheckpoint.load(job["checkpoint"])
+
+    def on_checkpoint(run_checkpoint):
+        job["checkpoint"] = run_checkpoint.path
+        jobs.update(job)
+
+    try:
+        result = run_crawl(
+            resources,
+            job["keywords"],
+            target_tweets=job.get("tweets_per_keyword"),
+            targets=job["targets"],
+            checkpoint=checkpoint,
+            on_checkpoint=on_checkpoint,
+        )
+    except KeyboardInterrupt:
+        # Stays in running/ and is picked up again on the next start
         raise
+    except Exception as e:
+        logging.error(f"Job {job['id']} failed: {e}")
+        jobs.fail(job, str(e))
+        return
+    seconds = result["seconds"]
+    result["tweets_per_minute"] = (
+        round(result["tweets"] / seconds * 60, 1) if seconds else 0.0
+    )
+    jobs.finish(job, result)
+    logging.info(
+        f"Finished job {job['id']}: {result['tweets']} tweets in "
+        f"{result['seconds']:.0f}s ({result['tweets_per_minute']} tweets/min)"
+    )
+
+
+def planner_density_file(config: dict) -> str:
+    return config.get("planner", {}).get("density_file", DEFAULT_DENSITY_PATH)
+
+
+def build_planner(
+    config: dict,
+    keywords: list,
+    target_tweets: int,
+    checkpoint: RunCheckpoint,
+    index: TweetIndex,
+    targets: Optional[dict] = None,
+) -> QueryPlanner:
+    """Plan the run's search shards, or pick up the plan of the run being resumed.
+
+    In incremental mode searches stop at the newest tweet earlier runs
+    collected for each keyword.
+    """
+    settings = config.get("planner", {})
+    marks = index.high_water_marks() if config.get("incremental", False) else {}
+    planner_settings = dict(
+        target_tweets=target_tweets,
+        window_days=settings.get("window_days", 7),
+        min_window_days=settings.get("min_window_days", 1),
+        max_window_days=settings.get("max_window_days", 30),
+        lookback_days=settings.get("lookback_days", 30),
+        tweets_per_shard=settings.get("tweets_per_shard", 200),
+        merge_below=settings.get("merge_below", 5),
+        max_merged=settings.get("max_merged", 3),
+        max_attempts=settings.get("max_attempts", 3),
+        max_rate_limit_retries=config.get("rate_limit", {}).get("max_retries", 5),
+        densities=load_densities(planner_density_file(config)),
+        marks=marks,
+        targets=targets,
+    )
+    if checkpoint.planner_state:
+        return QueryPlanner.from_dict(checkpoint.planner_state, **planner_settings)
+    enabled = settings.get("enabled", False)
+    if enabled:
+        logging.info(
+            f"Planning searches over the last {planner_settings['lookback_days']} "
+            f"days; older tweets are not collected"
+        )
+    return QueryPlanner(keywords, enabled=enabled, **planner_settings)
+
+
+def export_metrics(metrics: RunMetrics, waiter, config: dict, timestamp: str):
+    """Write the run's metrics next to search_results and as a Prometheus textfile"""
+    waits = waiter.summary() if waiter else {}
+    metrics.export_json(
+        os.path.join("data", "output", f"metrics_{timestamp}.json"), waits
+    )
+    textfile = config.get("metrics", {}).get("prometheus_textfile")
+    if textfile:
+        metrics.export_prometheus(textfile, waits)
+
+
+def import_index():
+    """Backfill the tweet index from the files already in data/output"""
+    configure_logging()
+    config = load_config()
+    index = TweetIndex(config.get("index_file", DEFAULT_INDEX_PATH))
+    try:
+        added = index.backfill()
+        logging.info(f"Imported {added} tweets; index now holds {index.count()}")
     finally:
-        if browser:
-            browser.close()
+        index.close()
+
+
+def compact_output():
+    """Merge data/output into the deduplicated store and archive the files"""
+    configure_logging()
+    config = load_config()
+    settings = config.get("compaction", {})
+    index = TweetIndex(config.get("index_file", DEFAULT_INDEX_PATH))
+    compactor = OutputCompactor(
+        settings.get("store_file", DEFAULT_STORE_PATH),
+        archive_dir=settings.get("archive_dir", DEFAULT_ARCHIVE_DIR),
+        index=index,
+    )
+    try:
+        # Runs that can still be resumed keep appending to their output file
+        active = [checkpoint.output_file for checkpoint in RunCheckpoint.unfinished()]
+        summary = compactor.compact(exclude=active)
+        logging.info(
+            f"Compacted {summary['files']} files ({summary['tweets']} tweets, "
+            f"{summary['errors']} errors); store holds {compactor.count()} tweets"
+        )
+        if summary["errors"]:
+            raise SystemExit(1)
+    finally:
+        compactor.close()
+        index.close()
+
+
+def convert_output(source: str):
+    """Write the pretty JSON array version of an NDJSON output file"""
+    configure_logging()
+    filename = os.path.splitext(source)[0] + ".json"
+    if not TweetSaver().convert_ndjson_to_json(source, filename):
+        raise SystemExit(1)
 
 
 if __name__ == "__main__":
@@ -1,3 +1,3 @@
-from .tweet import Tweet
+from .tweet import Tweet, parse_count, parse_status_id
 
-__all__ = ["Tweet"]
+__all__ = ["Tweet", "parse_count", "parse_status_id"]
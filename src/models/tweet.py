@@ -1,18 +1,154 @@
-from dataclasses import dataclass
-from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, Optional, Union
+import re
+
+
+STATUS_ID_PATTERN = re.compile(r"/status(?:es)?/(\d+)")
+
+# Abbreviations used by the web client for large counts, in English and
+# Spanish ("1.2K", "1,2 mil", "3 M", "1 mil M"). Longest suffixes first.
+COUNT_SUFFIXES = (
+    ("mil m", 10**9),
+    ("b", 10**9),
+    ("mil", 10**3),
+    ("k", 10**3),
+    ("m", 10**6),
+)
+
+
+def parse_status_id(tweet_url: str) -> Optional[int]:
+    """Return the numeric status ID from a tweet URL, or None if it has none"""
+    match = STATUS_ID_PATTERN.search(tweet_url or "")
+    return int(match.group(1)) if match else None
+
+
+def parse_count(value: Union[str, int, None]) -> int:
+    """Parse an engagement count such as "", "87", "1,234", "1.2K" or "3,4 mil" """
+    if value is None:
+        return 0
+    if isinstance(value, (int, float)):
+        return int(value)
+
+    text = str(value).strip().lower().replace("\u00a0", " ")
+    if not text:
+        return 0
+
+    for suffix, multiplier in COUNT_SUFFIXES:
+        if text.endswith(suffix):
+            number = text[: -len(suffix)].strip().replace(",", ".")
+            try:
+                return int(round(float(number) * multiplier))
+            except ValueError:
+                return 0
+
+    # Plain counts only use "," or "." as thousands separators
+    digits = re.sub(r"\D", "", text)
+    return int(digits) if digits else 0
 
 
-@dataclass
 class Tweet:
-    username: str
-    text: str
-    tweet_url: str
-    timestamp: str  # Tweet's original timestamp
-    collection_time: str  # When we collected it
-    engagement: Dict[str, str] = None
-    parent_tweet_url: str = None  # For tracking comment relationships
-
-    def __post_init__(self):
-        if not self.engagement:
-            self.engagement = {"replies": "0", "retweets": "0", "likes": "0"}
+    """A collected tweet.
+
+    Slotted so hundreds of thousands of them stay cheap in memory. Engagement
+    is held as three integers and the status ID is parsed from the URL.
+    """
+
+    __slots__ = (
+        "username",
+        "text",
+        "_tweet_url",
+        "status_id",
+        "timestamp",  # Tweet's original timestamp
+        "collection_time",  # When we collected it
+        "replies",
+        "retweets",
+        "likes",
+        "parent_tweet_url",  # For tracking comment relationships
+        "keyword",  # Search keyword the tweet was found with
+        "duplicate_of",  # Canonical tweet this one is a near-duplicate of
+    )
+
+    def __init__(
+        self,
+        username: str,
+        text: str,
+        tweet_url: str,
+        timestamp: str,
+        collection_time: str,
+        engagement: Optional[Dict[str, Union[str, int]]] = None,
+        parent_tweet_url: Optional[str] = None,
+        keyword: Optional[str] = None,
+        duplicate_of: Optional[str] = None,
+    ):
+        self.username = username
+        self.text = text
+        self.tweet_url = tweet_url
+        self.timestamp = timestamp
+        self.collection_time = collection_time
+        self.engagement = engagement
+        self.parent_tweet_url = parent_tweet_url
+        self.keyword = keyword
+        self.duplicate_of = duplicate_of
+
+    @property
+    def tweet_url(self) -> str:
+        return self._tweet_url
+
+    @tweet_url.setter
+    def tweet_url(self, value: str):
+        self._tweet_url = value
+        self.status_id = parse_status_id(value)
+
+    @property
+    def engagement(self) -> Dict[str, int]:
+        return {"replies": self.replies, "retweets": self.retweets, "likes": self.likes}
+
+    @engagement.setter
+    def engagement(self, value: Optional[Dict[str, Union[str, int]]]):
+        value = value or {}
+        self.replies = parse_count(value.get("replies"))
+        self.retweets = parse_count(value.get("retweets"))
+        self.likes = parse_count(value.get("likes"))
+
+    def to_dict(self) -> Dict:
+        return {
+            "username": self.username,
+            "text": self.text,
+            "tweet_url": self._tweet_url,
+            "status_id": self.status_id,
+            "timestamp": self.timestamp,
+            "collection_time": self.collection_time,
+            "engagement": {
+                "replies": self.replies,
+                "retweets": self.retweets,
+                "likes": self.likes,
+            },
+            "parent_tweet_url": self.parent_tweet_url,
+            "keyword": self.keyword,
+            "duplicate_of": self.duplicate_of,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Tweet":
+        """Build a Tweet from to_dict output or an older output record"""
+        return cls(
+            username=data.get("username"),
+            text=data.get("text"),
+            tweet_url=data.get("tweet_url"),
+            timestamp=data.get("timestamp"),
+            collection_time=data.get("collection_time"),
+            engagement=data.get("engagement"),
+            parent_tweet_url=data.get("parent_tweet_url"),
+            keyword=data.get("keyword"),
+            duplicate_of=data.get("duplicate_of"),
+        )
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Tweet):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return (
+            f"Tweet(username={self.username!r}, tweet_url={self._tweet_url!r}, "
+            f"timestamp={self.timestamp!r}, keyword={self.keyword!r})"
+        )
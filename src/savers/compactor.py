@@ -0,0 +1,291 @@
+from src.models.tweet import Tweet
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional
+
+
+DEFAULT_STORE_PATH = os.path.join("data", "store", "tweets.db")
+DEFAULT_ARCHIVE_DIR = os.path.join("data", "archive")
+
+TWEET_FILE_PATTERN = re.compile(r"^tweets_\d{8}_\d{6}\.(json|ndjson)$")
+SEARCH_RESULTS_PATTERN = re.compile(r"^search_results_\d{8}_\d{6}\.json$")
+
+
+def iter_json_array(path: str, chunk_size: int = 1 << 16) -> Iterator[Dict]:
+    """Yield the objects of a JSON array file without loading it whole"""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{path} is not a JSON array")
+        buffer = buffer[1:]
+        eof = False
+        while True:
+            buffer = buffer.lstrip().lstrip(",").lstrip()
+            if buffer.startswith("]"):
+                return
+            try:
+                record, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
+                continue
+            yield record
+            buffer = buffer[end:]
+
+
+def iter_tweet_file(path: str) -> Iterator[Dict]:
+    if path.endswith(".ndjson"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        yield from iter_json_array(path)
+
+
+class OutputCompactor:
+    """Merges historical output files into one deduplicated SQLite store.
+
+    Every tweet is kept once per status ID with the snapshot that has the
+    latest collection_time, so engagement counts are the freshest ones seen.
+    A parent_tweet_url found in any snapshot is kept, since the same tweet
+    can be collected as a reply in one run and as a search result in
+    another. search_results files are merged into their own table. Files are
+    read one record at a time, and each is moved to the archive (or deleted)
+    only after its records are committed, so an interrupted compaction can
+    simply be run again.
+    """
+
+    def __init__(
+        self,
+        store_path: str = DEFAULT_STORE_PATH,
+        archive_dir: Optional[str] = DEFAULT_ARCHIVE_DIR,
+        index=None,
+        batch_size: int = 1000,
+    ):
+        self.store_path = store_path
+        # None deletes consumed files instead of archiving them
+        self.archive_dir = archive_dir
+        # Optional TweetIndex, so tweets stay deduplicated once files are moved
+        self.index = index
+        self.batch_size = batch_size
+        os.makedirs(os.path.dirname(store_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(store_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tweets (
+                status_id INTEGER PRIMARY KEY,
+                keyword TEXT,
+                parent_tweet_url TEXT,
+                timestamp TEXT,
+                collection_time TEXT,
+                record TEXT NOT NULL
+            )
+            """
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS tweets_parent ON tweets (parent_tweet_url)"
+        )
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS search_results (
+                run TEXT NOT NULL,
+                keyword TEXT,
+                status TEXT NOT NULL,
+                tweets_found INTEGER,
+                reason TEXT
+            )
+            """
+        )
+        self.conn.commit()
+
+    def upsert(self, records: Iterable[Dict]) -> int:
+        """Merge tweet dicts into the store; returns how many were read"""
+        rows = []
+        for record in records:
+            tweet = Tweet.from_dict(record)
+            if tweet.status_id is None:
+                logging.warning(f"Skipping record without status ID: {record}")
+                continue
+            data = tweet.to_dict()
+            rows.append(
+                (
+                    tweet.status_id,
+                    tweet.keyword,
+                    tweet.parent_tweet_url,
+                    tweet.timestamp,
+                    tweet.collection_time,
+                    json.dumps(data, ensure_ascii=False),
+                )
+            )
+
+        # SET expressions see the stored row, so every column compares
+        # against the snapshot being replaced
+        newer = (
+            "(tweets.collection_time IS NULL "
+            "OR excluded.collection_time > tweets.collection_time)"
+        )
+        with self._lock:
+            self.conn.executemany(
+                "INSERT INTO tweets (status_id, keyword, parent_tweet_url, "
+                "timestamp, collection_time, record) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(status_id) DO UPDATE SET "
+                "parent_tweet_url = "
+                "COALESCE(tweets.parent_tweet_url, excluded.parent_tweet_url), "
+                f"keyword = CASE WHEN {newer} "
+                "THEN COALESCE(excluded.keyword, tweets.keyword) "
+                "ELSE COALESCE(tweets.keyword, excluded.keyword) END, "
+                f"timestamp = CASE WHEN {newer} "
+                "THEN excluded.timestamp ELSE tweets.timestamp END, "
+                f"record = CASE WHEN {newer} "
+                "THEN excluded.record ELSE tweets.record END, "
+                f"collection_time = CASE WHEN {newer} "
+                "THEN excluded.collection_time ELSE tweets.collection_time END",
+                rows,
+            )
+        if self.index is not None:
+            self.index.add_records(json.loads(row[-1]) for row in rows)
+        return len(rows)
+
+    def compact_tweet_file(self, path: str) -> int:
+        count = 0
+        batch = []
+        for record in iter_tweet_file(path):
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                count += self.upsert(batch)
+                batch = []
+        count += self.upsert(batch)
+        with self._lock:
+            self.conn.commit()
+        return count
+
+    def compact_search_results(self, path: str) -> int:
+        with open(path, "r", encoding="utf-8") as f:
+            results = json.load(f)
+        run = os.path.basename(path)[len("search_results_") : -len(".json")]
+        rows = [
+            (
+                run,
+                entry.get("keyword"),
+                status,
+                entry.get("tweets_found"),
+                entry.get("reason"),
+            )
+            for status in ("successful", "failed")
+            for entry in results.get(status, [])
+        ]
+        with self._lock:
+            self.conn.executemany(
+                "INSERT INTO search_results (run, keyword, status, tweets_found, "
+                "reason) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.conn.commit()
+        return len(rows)
+
+    def consume(self, path: str, archive_path: Optional[str]):
+        if archive_path is None:
+            os.remove(path)
+            return
+        os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+        shutil.move(path, archive_path)
+
+    def compact(
+        self,
+        output_dir: str = os.path.join("data", "output"),
+        exclude: Iterable[str] = (),
+    ) -> Dict[str, int]:
+        """Merge every run file in output_dir, then archive or delete it.
+
+        Files in exclude (e.g. the output of a run that can still be resumed)
+        are left alone.
+        """
+        summary = {"files": 0, "tweets": 0, "search_results": 0, "errors": 0}
+        if not os.path.isdir(output_dir):
+            return summary
+
+        excluded = {os.path.abspath(path) for path in exclude if path}
+        archive_run = None
+        if self.archive_dir is not None:
+            stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            archive_run = os.path.join(self.archive_dir, f"compaction_{stamp}")
+
+        for file in sorted(os.listdir(output_dir)):
+            path = os.path.join(output_dir, file)
+            if os.path.abspath(path) in excluded:
+                logging.info(f"Skipping {file}: its run can still be resumed")
+                continue
+            try:
+                if TWEET_FILE_PATTERN.match(file):
+                    count = self.compact_tweet_file(path)
+                    summary["tweets"] += count
+                elif SEARCH_RESULTS_PATTERN.match(file):
+                    count = self.compact_search_results(path)
+                    summary["search_results"] += count
+                else:
+                    continue
+                self.consume(
+                    path, os.path.join(archive_run, file) if archive_run else None
+                )
+                summary["files"] += 1
+                logging.info(f"Compacted {count} records from {file}")
+            except Exception as e:
+                with self._lock:
+                    self.conn.rollback()
+                summary["errors"] += 1
+                logging.error(f"Error compacting {file}: {e}")
+
+        return summary
+
+    def count(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM tweets").fetchone()[0]
+
+    def iter_tweets(
+        self,
+        keyword: Optional[str] = None,
+        parent_tweet_url: Optional[str] = None,
+    ) -> Iterator[Tweet]:
+        """Yield stored tweets, optionally only one keyword's or one thread's"""
+        query = "SELECT record, parent_tweet_url, keyword FROM tweets"
+        clauses, params = [], []
+        if keyword is not None:
+            clauses.append("keyword = ?")
+            params.append(keyword)
+        if parent_tweet_url is not None:
+            clauses.append("parent_tweet_url = ?")
+            params.append(parent_tweet_url)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY status_id"
+
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute(query, params)
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(self.batch_size)
+            if not rows:
+                return
+            for record, parent, stored_keyword in rows:
+                data = json.loads(record)
+                data["parent_tweet_url"] = parent
+                data["keyword"] = stored_keyword
+                yield Tweet.from_dict(data)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,210 @@
+from src.models.tweet import Tweet
+from src.utils.metrics import RunMetrics
+import hashlib
+import logging
+import os
+import random
+import re
+import sqlite3
+import threading
+import unicodedata
+from array import array
+from typing import Dict, List, Optional, Set, Tuple
+
+
+DEFAULT_SIGNATURE_PATH = os.path.join("data", "index", "near_duplicates.db")
+
+# MinHash values kept per tweet, compared BAND_ROWS at a time to find
+# candidates: 21 bands of 3 find 94% of the pairs with a similarity of 0.5
+# and 99% at 0.6, and candidates are then checked against the threshold
+SIGNATURE_SIZE = 64
+BAND_ROWS = 3
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+# Fixed so signatures stay comparable across runs
+_permutation_source = random.Random(1729)
+PERMUTATIONS = [
+    (
+        _permutation_source.randrange(1, MERSENNE_PRIME),
+        _permutation_source.randrange(0, MERSENNE_PRIME),
+    )
+    for _ in range(SIGNATURE_SIZE)
+]
+
+RETWEET_PATTERN = re.compile(r"^\s*rt\b:?", re.IGNORECASE)
+URL_PATTERN = re.compile(r"https?://\S+")
+MENTION_PATTERN = re.compile(r"@\w+")
+WORD_PATTERN = re.compile(r"\w+")
+
+# Drop or link modes for NearDuplicateIndex.filter
+DROP = "drop"
+LINK = "link"
+
+
+def normalize_tokens(text: str) -> List[str]:
+    """Words of a tweet without case, accents, an RT prefix, links or mentions"""
+    text = RETWEET_PATTERN.sub(" ", text or "")
+    text = URL_PATTERN.sub(" ", text)
+    text = MENTION_PATTERN.sub(" ", text)
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return WORD_PATTERN.findall(text)
+
+
+def shingles(tokens: List[str]) -> Set[str]:
+    """The words and word pairs of a tweet"""
+    return set(tokens) | {f"{a} {b}" for a, b in zip(tokens, tokens[1:])}
+
+
+def minhash(tokens: List[str]) -> bytes:
+    """MinHash signature of a tweet's shingles: SIGNATURE_SIZE 32-bit values"""
+    hashes = [
+        int.from_bytes(
+            hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big"
+        )
+        for shingle in shingles(tokens)
+    ]
+    signature = array(
+        "I",
+        (
+            min((a * value + b) % MERSENNE_PRIME & MAX_HASH for value in hashes)
+            for a, b in PERMUTATIONS
+        ),
+    )
+    return signature.tobytes()
+
+
+def similarity(first: bytes, second: bytes) -> float:
+    """Jaccard similarity of two tweets' shingles, estimated from signatures"""
+    matches = sum(a == b for a, b in zip(array("I", first), array("I", second)))
+    return matches / SIGNATURE_SIZE
+
+
+class NearDuplicateIndex:
+    """Persistent MinHash index of canonical tweet texts.
+
+    A tweet whose words and word pairs overlap an indexed one's with a
+    Jaccard similarity of at least threshold is a near-duplicate of it
+    (copy-pasted, retweeted or lightly edited reposts); any other tweet
+    becomes a canonical tweet itself. Similarity is estimated from MinHash
+    signatures, and a lookup only compares the tweets that share a band of
+    BAND_ROWS signature values with it. Tweets shorter than min_tokens words
+    are never matched.
+    """
+
+    def __init__(
+        self,
+        db_path: str = DEFAULT_SIGNATURE_PATH,
+        threshold: float = 0.5,
+        min_tokens: int = 5,
+        metrics=None,
+    ):
+        self.db_path = db_path
+        self.threshold = threshold
+        self.min_tokens = min_tokens
+        self.metrics = metrics or RunMetrics()
+        # Byte ranges of each band in a signature
+        width = array("I").itemsize
+        self.bands = [
+            (start * width, (start + BAND_ROWS) * width)
+            for start in range(0, SIGNATURE_SIZE - BAND_ROWS + 1, BAND_ROWS)
+        ]
+        self.buckets: List[Dict[bytes, List[Tuple[bytes, int, str]]]] = [
+            {} for _ in self.bands
+        ]
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS signatures (
+                status_id INTEGER PRIMARY KEY,
+                signature BLOB NOT NULL,
+                tweet_url TEXT NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+        rows = self.conn.execute(
+            "SELECT status_id, signature, tweet_url FROM signatures"
+        ).fetchall()
+        for status_id, signature, tweet_url in rows:
+            self.insert(bytes(signature), status_id, tweet_url)
+        logging.info(f"Loaded {len(rows)} tweet signatures from {db_path}")
+
+    def band_keys(self, signature: bytes) -> List[bytes]:
+        return [signature[start:end] for start, end in self.bands]
+
+    def insert(self, signature: bytes, status_id: int, tweet_url: str):
+        entry = (signature, status_id, tweet_url)
+        for buckets, key in zip(self.buckets, self.band_keys(signature)):
+            buckets.setdefault(key, []).append(entry)
+
+    def signature(self, text: str) -> Optional[bytes]:
+        tokens = normalize_tokens(text)
+        if len(tokens) < self.min_tokens:
+            return None
+        return minhash(tokens)
+
+    def find(self, signature: bytes) -> Optional[Tuple[int, str]]:
+        """Most similar canonical tweet at or above threshold, as (status_id, url)"""
+        best, best_similarity = None, self.threshold
+        compared = set()
+        for buckets, key in zip(self.buckets, self.band_keys(signature)):
+            for candidate, status_id, tweet_url in buckets.get(key, ()):
+                if status_id in compared:
+                    continue
+                compared.add(status_id)
+                score = similarity(candidate, signature)
+                if score >= best_similarity:
+                    best, best_similarity = (status_id, tweet_url), score
+        return best
+
+    def check(self, tweet: Tweet) -> Optional[str]:
+        """URL of the canonical tweet this one duplicates, or None.
+
+        A tweet that isn't a near-duplicate is added to the index.
+        """
+        if tweet.status_id is None:
+            return None
+        signature = self.signature(tweet.text)
+        if signature is None:
+            return None
+        with self._lock:
+            match = self.find(signature)
+            if match and match[0] != tweet.status_id:
+                return match[1]
+            if match is None:
+                self.insert(signature, tweet.status_id, tweet.tweet_url)
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO signatures (status_id, signature, "
+                    "tweet_url) VALUES (?, ?, ?)",
+                    (tweet.status_id, signature, tweet.tweet_url),
+                )
+        return None
+
+    def filter(self, tweets: List[Tweet], mode: str = LINK) -> List[Tweet]:
+        """Drop near-duplicates, or keep them with duplicate_of set"""
+        kept = []
+        duplicates = 0
+        for tweet in tweets:
+            canonical_url = self.check(tweet)
+            if canonical_url:
+                duplicates += 1
+                logging.debug(f"{tweet.tweet_url} near-duplicates {canonical_url}")
+                if mode == DROP:
+                    continue
+                tweet.duplicate_of = canonical_url
+            kept.append(tweet)
+        with self._lock:
+            self.conn.commit()
+        if duplicates:
+            self.metrics.increment("near_duplicates", duplicates)
+        return kept
+
+    def close(self):
+        with self._lock:
+            self.conn.commit()
+            self.conn.close()
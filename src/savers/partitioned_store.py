@@ -0,0 +1,308 @@
+from src.models.tweet import Tweet
+from src.utils.metrics import RunMetrics
+import gzip
+import json
+import logging
+import os
+import threading
+import urllib.parse
+from datetime import date
+from typing import Dict, Iterator, List, Optional, Union
+
+
+DEFAULT_DATASET_ROOT = os.path.join("data", "dataset")
+UNKNOWN_DATE = "unknown"
+
+# Kinds of rows read() can select on
+TWEETS = "tweets"
+REPLIES = "replies"
+
+
+def keyword_partition(keyword: Optional[str]) -> str:
+    return "keyword=" + urllib.parse.quote(keyword or "", safe="")
+
+
+def date_partition(timestamp: Optional[str]) -> str:
+    day = (timestamp or "")[:10]
+    try:
+        date.fromisoformat(day)
+    except ValueError:
+        day = UNKNOWN_DATE
+    return f"date={day}"
+
+
+def partition_value(name: str) -> str:
+    return urllib.parse.unquote(name.split("=", 1)[1])
+
+
+def as_date(value: Union[date, str, None]) -> Optional[str]:
+    if value is None:
+        return None
+    return value.isoformat() if isinstance(value, date) else str(value)
+
+
+class PartitionedTweetSaver:
+    """Writes tweets as gzip-compressed NDJSON partitioned by keyword and date.
+
+    Files live under root/keyword=<keyword>/date=<YYYY-MM-DD>/, one per run
+    and partition. Tweets are buffered per partition and written as a row
+    group of row_group_size rows: a separate gzip member appended to the
+    file, so the whole file still reads with zcat. Each file has a
+    .stats.json sidecar listing its row groups with their byte range, row
+    count, status ID and timestamp range and number of replies, which lets
+    TweetDataset skip row groups without decompressing them.
+
+    At most max_buffered_rows tweets are held across all partitions; past
+    that the largest buffers are written early, as smaller row groups.
+    Callers that record progress call flush() first, since buffered tweets
+    are lost if the process dies.
+
+    Has the same write()/close() interface as StreamingTweetSaver. The index
+    is only updated once a row group is on disk.
+    """
+
+    def __init__(
+        self,
+        root: str = DEFAULT_DATASET_ROOT,
+        run_id: str = "run",
+        index=None,
+        row_group_size: int = 500,
+        max_buffered_rows: int = 5000,
+        metrics=None,
+    ):
+        self.root = root
+        self.run_id = run_id
+        self.index = index
+        self.row_group_size = max(1, row_group_size)
+        self.max_buffered_rows = max(self.row_group_size, max_buffered_rows)
+        self.metrics = metrics or RunMetrics()
+        self.count = 0
+        self._buffers: Dict[str, List[Tweet]] = {}
+        self._lock = threading.Lock()
+
+    def partition_dir(self, tweet: Tweet) -> str:
+        return os.path.join(
+            self.root, keyword_partition(tweet.keyword), date_partition(tweet.timestamp)
+        )
+
+    def write(self, tweets: List[Tweet]) -> bool:
+        if not tweets:
+            return True
+        with self.metrics.timer("save"):
+            return self._write(tweets)
+
+    def _write(self, tweets: List[Tweet]) -> bool:
+        try:
+            with self._lock:
+                for tweet in tweets:
+                    self._buffers.setdefault(self.partition_dir(tweet), []).append(
+                        tweet
+                    )
+                full = [
+                    partition
+                    for partition, buffered in self._buffers.items()
+                    if len(buffered) >= self.row_group_size
+                ]
+                for partition in full:
+                    self.flush_partition(partition)
+                buffered = sum(len(tweets) for tweets in self._buffers.values())
+                if buffered > self.max_buffered_rows:
+                    # Too many partitions open at once: write the largest
+                    # until half the budget is left
+                    for partition in sorted(
+                        self._buffers, key=lambda p: len(self._buffers[p]), reverse=True
+                    ):
+                        if buffered <= self.max_buffered_rows // 2:
+                            break
+                        buffered -= len(self._buffers[partition])
+                        self.flush_partition(partition)
+            return True
+        except Exception as e:
+            logging.error(f"Error writing partitioned tweets: {e}")
+            return False
+
+    def flush_partition(self, partition: str):
+        tweets = self._buffers.get(partition)
+        if not tweets:
+            return
+        os.makedirs(partition, exist_ok=True)
+        data_path = os.path.join(partition, f"part-{self.run_id}.ndjson.gz")
+        stats_path = os.path.join(partition, f"part-{self.run_id}.stats.json")
+
+        payload = gzip.compress(
+            "".join(
+                json.dumps(tweet.to_dict(), ensure_ascii=False) + "\n"
+                for tweet in tweets
+            ).encode("utf-8")
+        )
+        with open(data_path, "ab") as f:
+            offset = f.tell()
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+
+        status_ids = [tweet.status_id for tweet in tweets if tweet.status_id]
+        timestamps = [tweet.timestamp for tweet in tweets if tweet.timestamp]
+        stats = self.read_stats(stats_path)
+        stats["row_groups"].append(
+            {
+                "offset": offset,
+                "length": len(payload),
+                "rows": len(tweets),
+                "replies": sum(1 for tweet in tweets if tweet.parent_tweet_url),
+                "min_status_id": min(status_ids) if status_ids else None,
+                "max_status_id": max(status_ids) if status_ids else None,
+                "min_timestamp": min(timestamps) if timestamps else None,
+                "max_timestamp": max(timestamps) if timestamps else None,
+            }
+        )
+        stats["rows"] = sum(group["rows"] for group in stats["row_groups"])
+        tmp_path = f"{stats_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(stats, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, stats_path)
+
+        del self._buffers[partition]
+        self.count += len(tweets)
+        if self.index is not None:
+            self.index.add_tweets(tweets)
+        logging.info(f"Wrote {len(tweets)} tweets to {data_path}")
+
+    def read_stats(self, stats_path: str) -> Dict:
+        if os.path.exists(stats_path):
+            with open(stats_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {"file": os.path.basename(stats_path), "rows": 0, "row_groups": []}
+
+    def flush(self):
+        with self._lock:
+            for partition in list(self._buffers):
+                try:
+                    self.flush_partition(partition)
+                except Exception as e:
+                    logging.error(f"Error flushing partition {partition}: {e}")
+
+    def close(self):
+        self.flush()
+        logging.info(f"Saved {self.count} tweets to {self.root}")
+
+
+class TweetDataset:
+    """Reads tweets written by PartitionedTweetSaver.
+
+    Only the keyword and date partitions asked for are opened, and row groups
+    whose statistics rule them out are skipped without being decompressed.
+    """
+
+    def __init__(self, root: str = DEFAULT_DATASET_ROOT):
+        self.root = root
+
+    def keywords(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            partition_value(name)
+            for name in os.listdir(self.root)
+            if name.startswith("keyword=")
+        )
+
+    def partitions(
+        self,
+        keywords: Optional[List[str]] = None,
+        since: Union[date, str, None] = None,
+        until: Union[date, str, None] = None,
+    ) -> List[str]:
+        """Partition directories matching the filters; until is exclusive"""
+        since, until = as_date(since), as_date(until)
+        selected = []
+        for keyword in keywords if keywords is not None else self.keywords():
+            keyword_dir = os.path.join(self.root, keyword_partition(keyword))
+            if not os.path.isdir(keyword_dir):
+                continue
+            for name in sorted(os.listdir(keyword_dir)):
+                if not name.startswith("date="):
+                    continue
+                day = partition_value(name)
+                if (since or until) and day == UNKNOWN_DATE:
+                    continue
+                if since and day < since or until and day >= until:
+                    continue
+                selected.append(os.path.join(keyword_dir, name))
+        return selected
+
+    def read(
+        self,
+        keywords: Optional[List[str]] = None,
+        since: Union[date, str, None] = None,
+        until: Union[date, str, None] = None,
+        kind: Optional[str] = None,
+        parent_tweet_url: Optional[str] = None,
+    ) -> Iterator[Tweet]:
+        """Yield stored tweets matching every filter given.
+
+        kind is TWEETS for search results, REPLIES for replies or None for
+        both; parent_tweet_url selects the replies to one tweet.
+        """
+        if parent_tweet_url is not None:
+            kind = REPLIES
+        since, until = as_date(since), as_date(until)
+
+        for partition in self.partitions(keywords, since, until):
+            for name in sorted(os.listdir(partition)):
+                if not name.endswith(".stats.json"):
+                    continue
+                stats_path = os.path.join(partition, name)
+                data_path = stats_path[: -len(".stats.json")] + ".ndjson.gz"
+                try:
+                    with open(stats_path, "r", encoding="utf-8") as f:
+                        stats = json.load(f)
+                    with open(data_path, "rb") as f:
+                        for group in stats["row_groups"]:
+                            if not self.group_matches(group, since, until, kind):
+                                continue
+                            f.seek(group["offset"])
+                            payload = gzip.decompress(f.read(group["length"]))
+                            for line in payload.decode("utf-8").splitlines():
+                                tweet = Tweet.from_dict(json.loads(line))
+                                if self.row_matches(
+                                    tweet, since, until, kind, parent_tweet_url
+                                ):
+                                    yield tweet
+                except Exception as e:
+                    logging.error(f"Error reading {data_path}: {e}")
+
+    def group_matches(
+        self,
+        group: Dict,
+        since: Optional[str],
+        until: Optional[str],
+        kind: Optional[str],
+    ) -> bool:
+        if kind == REPLIES and not group["replies"]:
+            return False
+        if kind == TWEETS and group["replies"] == group["rows"]:
+            return False
+        if since and group["max_timestamp"] and group["max_timestamp"][:10] < since:
+            return False
+        if until and group["min_timestamp"] and group["min_timestamp"][:10] >= until:
+            return False
+        return True
+
+    def row_matches(
+        self,
+        tweet: Tweet,
+        since: Optional[str],
+        until: Optional[str],
+        kind: Optional[str],
+        parent_tweet_url: Optional[str],
+    ) -> bool:
+        if kind == REPLIES and not tweet.parent_tweet_url:
+            return False
+        if kind == TWEETS and tweet.parent_tweet_url:
+            return False
+        if parent_tweet_url is not None and tweet.parent_tweet_url != parent_tweet_url:
+            return False
+        day = (tweet.timestamp or "")[:10]
+        if since and day < since or until and day >= until:
+            return False
+        return True
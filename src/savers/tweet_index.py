@@ -0,0 +1,202 @@
+from src.models.tweet import Tweet, parse_status_id
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+DEFAULT_INDEX_PATH = os.path.join("data", "index", "tweets.db")
+
+
+class TweetIndex:
+    """Persistent SQLite index of stored tweets keyed by status ID.
+
+    Also keeps each keyword's high-water mark: the newest tweet an earlier
+    run collected for it, so incremental runs can stop where that run began,
+    and the reply count of every thread whose replies were crawled.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_INDEX_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tweets (
+                status_id INTEGER PRIMARY KEY,
+                tweet_url TEXT NOT NULL,
+                collection_time TEXT
+            )
+            """
+        )
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS keyword_marks (
+                keyword TEXT PRIMARY KEY,
+                status_id INTEGER NOT NULL,
+                timestamp TEXT
+            )
+            """
+        )
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS reply_threads (
+                status_id INTEGER PRIMARY KEY,
+                reply_count INTEGER NOT NULL,
+                replies_collected INTEGER NOT NULL,
+                crawled_at TEXT
+            )
+            """
+        )
+        self.conn.commit()
+
+    def contains(self, tweet_url: str) -> bool:
+        status_id = parse_status_id(tweet_url)
+        if status_id is None:
+            return False
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM tweets WHERE status_id = ?", (status_id,)
+            ).fetchone()
+        return row is not None
+
+    def count(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM tweets").fetchone()[0]
+
+    def iter_status_ids(self, batch_size: int = 10000) -> Iterator[int]:
+        """Yield every indexed status ID without loading them all at once"""
+        last = -1
+        while True:
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT status_id FROM tweets WHERE status_id > ? "
+                    "ORDER BY status_id LIMIT ?",
+                    (last, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            for (status_id,) in rows:
+                yield status_id
+            last = rows[-1][0]
+
+    def add_records(self, records: Iterable[Dict]) -> int:
+        """Insert tweet dicts, ignoring ones already indexed. Returns rows added"""
+        rows = []
+        for record in records:
+            status_id = parse_status_id(record.get("tweet_url"))
+            if status_id is not None:
+                rows.append(
+                    (status_id, record["tweet_url"], record.get("collection_time"))
+                )
+
+        with self._lock:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO tweets (status_id, tweet_url, collection_time) "
+                "VALUES (?, ?, ?)",
+                rows,
+            )
+            self.conn.commit()
+            return self.conn.total_changes - before
+
+    def add_tweets(self, tweets: List[Tweet]) -> int:
+        return self.add_records(
+            {"tweet_url": tweet.tweet_url, "collection_time": tweet.collection_time}
+            for tweet in tweets
+        )
+
+    def high_water_marks(self) -> Dict[str, Dict]:
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT keyword, status_id, timestamp FROM keyword_marks"
+            ).fetchall()
+        return {
+            keyword: {"status_id": status_id, "timestamp": timestamp}
+            for keyword, status_id, timestamp in rows
+        }
+
+    def update_high_water_mark(self, keyword: str, status_id: int, timestamp: str):
+        """Move keyword's mark up to status_id; it never moves down"""
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO keyword_marks (keyword, status_id, timestamp) "
+                "VALUES (?, ?, ?) "
+                "ON CONFLICT(keyword) DO UPDATE SET "
+                "status_id = excluded.status_id, timestamp = excluded.timestamp "
+                "WHERE excluded.status_id > keyword_marks.status_id",
+                (keyword, status_id, timestamp),
+            )
+            self.conn.commit()
+
+    def reply_thread(self, tweet_url: str) -> Optional[Dict]:
+        """Reply count and replies collected at the tweet's last thread crawl"""
+        status_id = parse_status_id(tweet_url)
+        if status_id is None:
+            return None
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT reply_count, replies_collected, crawled_at "
+                "FROM reply_threads WHERE status_id = ?",
+                (status_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        reply_count, replies_collected, crawled_at = row
+        return {
+            "reply_count": reply_count,
+            "replies_collected": replies_collected,
+            "crawled_at": crawled_at,
+        }
+
+    def record_reply_thread(self, tweet_url: str, reply_count: int, collected: int):
+        """Store the reply count a thread had when collected more of its replies"""
+        status_id = parse_status_id(tweet_url)
+        if status_id is None:
+            return
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO reply_threads (status_id, reply_count, "
+                "replies_collected, crawled_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(status_id) DO UPDATE SET "
+                "reply_count = MAX(reply_count, excluded.reply_count), "
+                "replies_collected = replies_collected + excluded.replies_collected, "
+                "crawled_at = excluded.crawled_at",
+                (status_id, reply_count, collected, datetime.now().isoformat()),
+            )
+            self.conn.commit()
+
+    def backfill(self, output_dir: str = os.path.join("data", "output")) -> int:
+        """One-time import of every tweet file stored under output_dir"""
+        added = 0
+        if not os.path.isdir(output_dir):
+            return added
+
+        for file in sorted(os.listdir(output_dir)):
+            if not file.endswith((".json", ".ndjson")):
+                continue
+            try:
+                with open(os.path.join(output_dir, file), "r", encoding="utf-8") as f:
+                    if file.endswith(".ndjson"):
+                        tweets = [json.loads(line) for line in f if line.strip()]
+                    else:
+                        tweets = json.load(f)
+                if not isinstance(tweets, list):
+                    logging.debug(f"Skipping non-tweet file {file}")
+                    continue
+                file_added = self.add_records(tweets)
+                added += file_added
+                logging.info(f"Indexed {file_added} tweets from {file}")
+            except Exception as e:
+                logging.error(f"Error importing tweets from {file}: {e}")
+
+        return added
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
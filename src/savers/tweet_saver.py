@@ -1,19 +1,114 @@
 from src.models.tweet import Tweet
+from src.utils.metrics import RunMetrics
 import json
 import logging
 from typing import List, Dict
 import os
+import threading
 
 
 class TweetSaver:
+    def __init__(self, index=None, metrics=None):
+        # Optional TweetIndex updated with every successfully saved batch
+        self.index = index
+        self.metrics = metrics or RunMetrics()
+
     def save_to_json(self, tweets: List[Tweet], filename: str) -> bool:
+        with self.metrics.timer("save"):
+            return self._save_to_json(tweets, filename)
+
+    def _save_to_json(self, tweets: List[Tweet], filename: str) -> bool:
         try:
             os.makedirs(os.path.dirname(filename), exist_ok=True)
-            tweet_data = [tweet.__dict__ for tweet in tweets]
+            tweet_data = [tweet.to_dict() for tweet in tweets]
             with open(filename, "w", encoding="utf-8") as f:
                 json.dump(tweet_data, f, ensure_ascii=False, indent=2)
             logging.info(f"Saved {len(tweets)} tweets to {filename}")
+            if self.index is not None:
+                self.index.add_tweets(tweets)
             return True
         except Exception as e:
             logging.error(f"Error saving JSON: {e}")
             return False
+
+    def convert_ndjson_to_json(self, source: str, filename: str) -> bool:
+        """Rewrite an NDJSON stream as the pretty JSON array save_to_json writes.
+
+        Records are converted one line at a time so memory stays flat.
+        """
+        try:
+            os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+            count = 0
+            with open(source, "r", encoding="utf-8") as src, open(
+                filename, "w", encoding="utf-8"
+            ) as dst:
+                dst.write("[")
+                for line in src:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    record = json.dumps(json.loads(line), ensure_ascii=False, indent=2)
+                    dst.write(",\n  " if count else "\n  ")
+                    dst.write(record.replace("\n", "\n  "))
+                    count += 1
+                dst.write("\n]" if count else "]")
+            logging.info(f"Converted {count} tweets from {source} to {filename}")
+            return True
+        except Exception as e:
+            logging.error(f"Error converting {source}: {e}")
+            return False
+
+
+class StreamingTweetSaver:
+    """Append-only NDJSON writer that persists tweets as they are extracted"""
+
+    def __init__(
+        self, filename: str, index=None, fsync_every: int = 100, metrics=None
+    ):
+        self.filename = filename
+        # Optional TweetIndex updated with every written batch
+        self.index = index
+        self.metrics = metrics or RunMetrics()
+        self.fsync_every = fsync_every
+        self.count = 0
+        self._unsynced = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+        self._file = open(filename, "a", encoding="utf-8")
+
+    def write(self, tweets: List[Tweet]) -> bool:
+        if not tweets:
+            return True
+        with self.metrics.timer("save"):
+            return self._write(tweets)
+
+    def _write(self, tweets: List[Tweet]) -> bool:
+        try:
+            lines = "".join(
+                json.dumps(tweet.to_dict(), ensure_ascii=False) + "\n"
+                for tweet in tweets
+            )
+            with self._lock:
+                self._file.write(lines)
+                self._file.flush()
+                self.count += len(tweets)
+                self._unsynced += len(tweets)
+                if self._unsynced >= self.fsync_every:
+                    os.fsync(self._file.fileno())
+                    self._unsynced = 0
+            if self.index is not None:
+                self.index.add_tweets(tweets)
+            logging.info(f"Appended {len(tweets)} tweets to {self.filename}")
+            return True
+        except Exception as e:
+            logging.error(f"Error appending tweets: {e}")
+            return False
+
+    def close(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+        logging.info(f"Saved {self.count} tweets to {self.filename}")
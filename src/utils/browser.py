@@ -1,8 +1,5 @@
 from selenium import webdriver
-from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException
 import logging
@@ -10,81 +7,409 @@ import sys
 import os
 import json
 import pickle
-import time
+import threading
+from typing import Dict, List, Optional
+from src.utils.config import load_config
+from src.utils.metrics import RunMetrics
+from src.utils.selectors import HOME_LINK, LOGIN_PASSWORD, LOGIN_USERNAME, SELECTORS
+from src.utils.waits import AdaptiveWaiter
+
+
+# Looks up several named elements in one round trip. arguments[1] maps each
+# name to its candidate selectors in order; the first one matching anything
+# inside arguments[0] (the document when null) wins. Selectors this Chrome
+# can't parse count as misses.
+LOOKUP_SCRIPT = """
+const root = arguments[0] || document;
+const found = {};
+for (const [name, candidates] of Object.entries(arguments[1])) {
+    found[name] = null;
+    for (const selector of candidates) {
+        let elements = [];
+        try {
+            elements = root.querySelectorAll(selector);
+        } catch (e) {}
+        if (elements.length) {
+            found[name] = {selector: selector, elements: Array.from(elements)};
+            break;
+        }
+    }
+}
+return found;
+"""
+
+# Like LOOKUP_SCRIPT, but reads the first match of each name instead of
+# returning elements, so reading them costs no further driver calls. Each hit
+# comes back as its trimmed text, the href of the link it sits in and the
+# attributes arguments[2] lists for its name.
+READ_SCRIPT = """
+const [root, names, attributes] = arguments;
+const found = {};
+for (const [name, candidates] of Object.entries(names)) {
+    found[name] = null;
+    for (const selector of candidates) {
+        let el = null;
+        try {
+            el = (root || document).querySelector(selector);
+        } catch (e) {}
+        if (el) {
+            const link = el.closest("a");
+            const values = {};
+            for (const attribute of attributes[name] || []) {
+                values[attribute] = el.getAttribute(attribute);
+            }
+            found[name] = {
+                selector: selector,
+                text: el.innerText.trim(),
+                link: link ? link.href : null,
+                attributes: values,
+            };
+            break;
+        }
+    }
+}
+return found;
+"""
+
+
+class SelectorMissError(Exception):
+    """A named element kept matching nothing: the page layout likely changed"""
 
 
 class SearcherDriver:
-    def __init__(self, executable_path):
-        if executable_path is None:
-            print(
-                "[WARNING] No executable path provided. Searching for chromedriver in PATH"
+    """Finds page elements by name instead of by inline CSS.
+
+    Each name has ordered fallback selectors in the registry (see
+    src/utils/selectors.py); the first one that matches is remembered and
+    tried first for the rest of the session. Lookups never wait for elements
+    to appear, and once a name has missed miss_limit times in a row without
+    a hit, SelectorMissError is raised so callers give up on the page rather
+    than keep paying for lookups that can't succeed. One instance is shared
+    per driver through for_driver().
+    """
+
+    _sessions_lock = threading.Lock()
+
+    def __init__(
+        self,
+        driver,
+        selectors: Optional[Dict[str, List[str]]] = None,
+        miss_limit: Optional[int] = 50,
+        metrics=None,
+    ):
+        self.driver = driver
+        self.selectors = {
+            name: list(candidates)
+            for name, candidates in (selectors or SELECTORS).items()
+        }
+        self.miss_limit = miss_limit
+        self.metrics = metrics or RunMetrics()
+        self.working: Dict[str, str] = {}
+        self.misses: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_driver(cls, driver, **kwargs) -> "SearcherDriver":
+        """The driver's shared instance, created with kwargs on first use.
+
+        It is kept on the driver itself, so both go away together.
+        """
+        with cls._sessions_lock:
+            session = getattr(driver, "_searcher_driver", None)
+            if session is None:
+                session = cls(driver, **kwargs)
+                driver._searcher_driver = session
+            return session
+
+    def candidates(self, name: str) -> List[str]:
+        """name's selectors, the one known to work this session first"""
+        candidates = self.selectors[name]
+        working = self.working.get(name)
+        if working is None or working == candidates[0]:
+            return candidates
+        return [working] + [c for c in candidates if c != working]
+
+    def css(self, name: str, suffix: str = "") -> str:
+        """One CSS selector for name, for waits and scripts that take CSS.
+
+        The selector known to work when there is one, otherwise a list of
+        every candidate; suffix is appended to each.
+        """
+        working = self.working.get(name)
+        candidates = [working] if working else self.selectors[name]
+        return ", ".join(f"{candidate}{suffix}" for candidate in candidates)
+
+    def hit(self, name: str, selector: str):
+        with self._lock:
+            self.misses[name] = 0
+            if self.working.get(name) == selector:
+                return
+            self.working[name] = selector
+        if selector != self.selectors[name][0]:
+            logging.warning(f"Selector for '{name}' fell back to {selector}")
+            self.metrics.increment("selector_fallbacks")
+
+    def miss(self, name: str, count: int = 1):
+        """Count misses for name, raising SelectorMissError at miss_limit"""
+        with self._lock:
+            misses = self.misses.get(name, 0) + count
+            storm = bool(self.miss_limit) and misses >= self.miss_limit
+            # Start over so the next page gets its own chance
+            self.misses[name] = 0 if storm else misses
+        self.metrics.increment("selector_misses", count)
+        if storm:
+            self.metrics.increment("selector_miss_storms")
+            raise SelectorMissError(
+                f"No selector for '{name}' matched {misses} times in a row; "
+                f"the page layout may have changed"
             )
 
-        self.driver = webdriver.Chrome(
-            service=webdriver.ChromeService(executable_path=executable_path)
+    def record(self, hits: Dict[str, str], misses: Dict[str, int]):
+        """Apply a batched lookup's results; a name with any hit isn't missed"""
+        for name, selector in hits.items():
+            self.hit(name, selector)
+        for name, count in misses.items():
+            if count and name not in hits:
+                self.miss(name, count)
+
+    def lookup(
+        self, names: List[str], root=None, track: bool = True
+    ) -> Dict[str, List]:
+        """Find every named element inside root in one script call.
+
+        Maps each name to the elements its first matching selector found, or
+        to an empty list. Misses only count towards miss_limit with track.
+        """
+        found = self.driver.execute_script(
+            LOOKUP_SCRIPT, root, {name: self.candidates(name) for name in names}
         )
-        self.by_type = {"id": By.ID, "css": By.CSS_SELECTOR, "xpath": By.XPATH}
-
-    def get(self, url):
-        self.driver.get(url)
-
-    def close(self):
-        self.driver.close()
-
-    def get_element_by(self, selector_type, selector, timeout=5):
-        by_selector = self.by_type.get(selector_type)
-
-        if by_selector is None:
-            raise ValueError(
-                f"Invalid selector type: {selector_type} - must be 'id', 'css', or 'xpath'"
-            )
+        found = found or {}
+        elements, hits, misses = {}, {}, {}
+        for name in names:
+            match = found.get(name)
+            if match:
+                elements[name] = match["elements"]
+                hits[name] = match["selector"]
+            else:
+                elements[name] = []
+                misses[name] = 1
+        self.record(hits, misses if track else {})
+        return elements
 
-        element = WebDriverWait(self.driver, timeout).until(
-            EC.presence_of_element_located((by_selector, selector))
+    def read(
+        self,
+        names: List[str],
+        root=None,
+        attributes: Optional[Dict[str, List[str]]] = None,
+        track: bool = True,
+    ) -> Dict[str, Optional[Dict]]:
+        """Read the first element of every name inside root in one script call.
+
+        Maps each name to {"text", "link", "attributes"} for its element, with
+        the attributes listed for it in attributes, or to None. Misses only
+        count towards miss_limit with track.
+        """
+        found = self.driver.execute_script(
+            READ_SCRIPT,
+            root,
+            {name: self.candidates(name) for name in names},
+            attributes or {},
         )
-
-        if element is None:
-            raise Exception(f"Element not found: {selector}")
-
-        return element
-
-    def get_elements_by(self, selector_type, selector, timeout=5):
-        by_selector = self.by_type.get(selector_type)
-
-        if by_selector is None:
-            raise ValueError(
-                f"Invalid selector type: {selector_type} - must be 'id', 'css', or 'xpath'"
-            )
-
-        elements = WebDriverWait(self.driver, timeout).until(
-            EC.presence_of_all_elements_located((by_selector, selector))
+        found = found or {}
+        values, hits, misses = {}, {}, {}
+        for name in names:
+            match = found.get(name)
+            values[name] = match
+            if match:
+                hits[name] = match["selector"]
+            else:
+                misses[name] = 1
+        self.record(hits, misses if track else {})
+        return values
+
+    def wait_for(
+        self, name: str, waiter, wait_name: str, max_wait: Optional[float] = None
+    ):
+        """Wait with waiter until name renders, returning its first element.
+
+        Returns None on timeout; a slow page is not counted as a miss.
+        """
+        elements = waiter.until(
+            self.driver,
+            lambda driver: self.lookup([name], track=False)[name] or False,
+            wait_name,
+            max_wait,
         )
-
-        if elements is None:
-            raise Exception(f"Elements not found: {selector}")
-
-        return elements
+        return elements[0] if elements else None
+
+
+# Requests Chrome is told to drop when block_resources is on: images, video
+# and fonts the scraper never reads. Scripts, stylesheets and API calls load.
+BLOCKED_URL_PATTERNS = [
+    "*pbs.twimg.com/media/*",
+    "*pbs.twimg.com/profile_images/*",
+    "*pbs.twimg.com/profile_banners/*",
+    "*pbs.twimg.com/card_img/*",
+    "*pbs.twimg.com/ext_tw_video_thumb/*",
+    "*pbs.twimg.com/amplify_video_thumb/*",
+    "*pbs.twimg.com/tweet_video_thumb/*",
+    "*video.twimg.com/*",
+    "*.jpg*",
+    "*.jpeg*",
+    "*.png*",
+    "*.gif*",
+    "*.webp*",
+    "*.mp4*",
+    "*.m3u8*",
+    "*.m4s*",
+    "*.woff*",
+    "*.ttf*",
+]
 
 
 class Browser:
-    def __init__(self):
+    """An authenticated Chrome session.
+
+    Options come from the browser_settings section of config.json unless
+    settings is given; an explicit headless argument overrides the setting.
+    """
+
+    def __init__(
+        self,
+        waiter=None,
+        capture_network=False,
+        authenticate=True,
+        headless: Optional[bool] = None,
+        metrics=None,
+        settings: Optional[Dict] = None,
+        profile: str = "default",
+    ):
         logging.basicConfig(
             level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
         )
+        if settings is None:
+            settings = load_config().get("browser_settings", {})
+        self.settings = settings
+        if headless is None:
+            headless = settings.get("headless", False)
+
         self.options = Options()
         self.options.add_argument("--start-maximized")
         self.options.add_argument("--disable-notifications")
-        self.driver = webdriver.Chrome(options=self.options)
+        self.options.add_argument("--autoplay-policy=user-gesture-required")
+        self.options.add_argument("--mute-audio")
+        if headless:
+            self.options.add_argument("--headless=new")
+            self.options.add_argument("--window-size=1920,1080")
+        user_data_dir = settings.get("user_data_dir")
+        if user_data_dir:
+            # One profile per session: Chrome locks a profile while it's in use
+            profile_dir = os.path.abspath(os.path.join(user_data_dir, profile))
+            os.makedirs(profile_dir, exist_ok=True)
+            self.options.add_argument(f"--user-data-dir={profile_dir}")
+        if capture_network:
+            # Exposes network events to NetworkTweetExtractor via get_log
+            self.options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        self.waiter = waiter or AdaptiveWaiter()
+        self.metrics = metrics or RunMetrics()
+        self.start_driver()
         self.cookie_dir = os.path.join("data", "cookies")
         self.cookie_path = os.path.join(self.cookie_dir, "twitter_cookies.pkl")
         os.makedirs(self.cookie_dir, exist_ok=True)
-        self.authenticate()
+        if authenticate:
+            self.authenticate()
+
+    def start_driver(self):
+        with self.metrics.timer("browser_start"):
+            self.driver = webdriver.Chrome(options=self.options)
+        self.metrics.instrument_driver(self.driver)
+        self.searcher = SearcherDriver.for_driver(
+            self.driver,
+            miss_limit=self.settings.get("selector_miss_limit", 50),
+            metrics=self.metrics,
+        )
+        if self.settings.get("block_resources", False):
+            self.block_resources()
+
+    def restart(self):
+        """Replace the Chrome session with a fresh one and log in again.
+
+        The profile and saved cookies are reused, so this normally costs one
+        cookie login rather than a manual one.
+        """
+        self.quit_driver()
+        self.start_driver()
+        try:
+            if not self.authenticate():
+                raise Exception("Could not authenticate restarted browser session")
+        except Exception:
+            # A logged-out session still answers is_alive() but only returns
+            # login walls, so stop it; the next checkup tries again.
+            self.quit_driver()
+            raise
+
+    def quit_driver(self):
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logging.warning(f"Error stopping browser session: {e}")
+
+    def is_alive(self) -> bool:
+        """True if Chrome and chromedriver still answer commands"""
+        try:
+            self.driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def memory_mb(self) -> Optional[float]:
+        """Resident memory of chromedriver and every Chrome process it started.
+
+        Read from /proc, so None on systems without it.
+        """
+        try:
+            root = self.driver.service.process.pid
+            children: Dict[int, list] = {}
+            rss = {}
+            page_kb = os.sysconf("SC_PAGE_SIZE") / 1024
+            for entry in os.listdir("/proc"):
+                if not entry.isdigit():
+                    continue
+                try:
+                    with open(f"/proc/{entry}/stat") as f:
+                        # The command name can contain spaces; fields follow ")"
+                        fields = f.read().rsplit(")", 1)[1].split()
+                except OSError:
+                    continue
+                pid = int(entry)
+                children.setdefault(int(fields[1]), []).append(pid)
+                rss[pid] = int(fields[21]) * page_kb
+        except Exception:
+            return None
+
+        total, stack = 0.0, [root]
+        while stack:
+            pid = stack.pop()
+            total += rss.get(pid, 0)
+            stack.extend(children.get(pid, []))
+        return total / 1024
+
+    def block_resources(self, patterns=None):
+        """Stop Chrome from downloading images, video and fonts"""
+        try:
+            self.driver.execute_cdp_cmd("Network.enable", {})
+            self.driver.execute_cdp_cmd(
+                "Network.setBlockedURLs", {"urls": patterns or BLOCKED_URL_PATTERNS}
+            )
+        except Exception as e:
+            logging.error(f"Error blocking resources: {e}")
 
     def authenticate(self):
         logging.info("Starting authentication process...")
-        if self.try_cookie_auth():
-            return True
-        return self.try_manual_auth()
+        with self.metrics.timer("authenticate"):
+            if self.try_cookie_auth():
+                return True
+            return self.try_manual_auth()
 
     def try_cookie_auth(self):
         if not os.path.exists(self.cookie_path):
@@ -92,7 +417,7 @@ class Browser:
 
         try:
             self.driver.get("https://twitter.com")
-            time.sleep(3)
+            self.waiter.for_page_load(self.driver, "auth_landing")
 
             with open(self.cookie_path, "rb") as f:
                 cookies = pickle.load(f)
@@ -100,7 +425,6 @@ class Browser:
                     self.driver.add_cookie(cookie)
 
             self.driver.get("https://twitter.com/home")
-            time.sleep(5)
 
             if self.is_logged_in():
                 logging.info("Successfully authenticated with cookies")
@@ -124,27 +448,24 @@ class Browser:
                 creds = json.load(f)
 
             self.driver.get("https://twitter.com/i/flow/login")
-            time.sleep(5)
 
             # Enter username
-            username = WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located(
-                    (By.CSS_SELECTOR, 'input[autocomplete="username"]')
-                )
+            username = self.searcher.wait_for(
+                LOGIN_USERNAME, self.waiter, "auth_username"
             )
+            if username is None:
+                raise TimeoutException("Username field did not render")
             username.send_keys(creds["username"])
             username.send_keys(Keys.ENTER)
-            time.sleep(3)
 
             # Enter password
-            password = WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located(
-                    (By.CSS_SELECTOR, 'input[type="password"]')
-                )
+            password = self.searcher.wait_for(
+                LOGIN_PASSWORD, self.waiter, "auth_password"
             )
+            if password is None:
+                raise TimeoutException("Password field did not render")
             password.send_keys(creds["password"])
             password.send_keys(Keys.ENTER)
-            time.sleep(5)
 
             if self.is_logged_in():
                 logging.info("Manual login successful")
@@ -160,12 +481,9 @@ class Browser:
 
     def is_logged_in(self):
         try:
-            WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located(
-                    (By.CSS_SELECTOR, 'a[data-testid="AppTabBar_Home_Link"]')
-                )
-            )
-            return True
+            # Returns as soon as the home link renders
+            home_link = self.searcher.wait_for(HOME_LINK, self.waiter, "auth_home_link")
+            return home_link is not None
         except:
             return False
 
@@ -179,4 +497,5 @@ class Browser:
             logging.error(f"Failed to save cookies: {e}")
 
     def close(self):
-        self.driver.close()
+        # quit() also stops chromedriver; close() only shut the window
+        self.driver.quit()
@@ -0,0 +1,101 @@
+from src.utils.browser import Browser
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+
+class BrowserPool:
+    """A fixed set of authenticated Browser sessions crawling keywords in parallel"""
+
+    def __init__(
+        self,
+        size: int,
+        waiter=None,
+        capture_network=False,
+        metrics=None,
+        settings: Optional[Dict] = None,
+        name: str = "search",
+    ):
+        self.size = max(1, size)
+        self.waiter = waiter
+        self.capture_network = capture_network
+        self.metrics = metrics
+        self.settings = settings
+        self.name = name
+        self.browsers: List[Browser] = []
+
+    def start(self):
+        # The first session authenticates (manually if needed) and saves the
+        # cookie jar; the rest are started afterwards so they reuse it.
+        for i in range(self.size):
+            try:
+                self.browsers.append(
+                    Browser(
+                        waiter=self.waiter,
+                        capture_network=self.capture_network,
+                        metrics=self.metrics,
+                        settings=self.settings,
+                        profile=f"{self.name}_{i}",
+                    )
+                )
+                logging.info(f"Started browser session {i + 1}/{self.size}")
+            except Exception as e:
+                logging.error(f"Error starting browser session {i + 1}: {e}")
+                if not self.browsers:
+                    raise
+
+    def run_until_done(
+        self,
+        next_item: Callable[[], Optional[Any]],
+        task: Callable[[Browser, Any], None],
+        busy: Optional[Callable[[], bool]] = None,
+    ):
+        """Hand items from next_item() to free sessions until there are none left.
+
+        task(browser, item) runs on the worker threads; errors it raises are
+        logged and the worker moves on to the next item. Running items can
+        produce more, e.g. follow-up shards planned from an earlier one's
+        results: while busy() is true an idle worker waits for them instead of
+        stopping when next_item() returns None.
+        """
+        finished = threading.Condition()
+
+        def claim():
+            with finished:
+                while True:
+                    # Checked first: work is only added by items still running
+                    running = busy is not None and busy()
+                    item = next_item()
+                    if item is not None or not running:
+                        return item
+                    finished.wait()
+
+        def worker(browser: Browser):
+            while True:
+                item = claim()
+                if item is None:
+                    return
+                try:
+                    task(browser, item)
+                except Exception as e:
+                    logging.error(f"Worker error on {item!r}: {e}")
+                finally:
+                    with finished:
+                        finished.notify_all()
+
+        threads = [
+            threading.Thread(target=worker, args=(browser,), daemon=True)
+            for browser in self.browsers
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def close(self):
+        for browser in self.browsers:
+            try:
+                browser.close()
+            except Exception as e:
+                logging.error(f"Error closing browser session: {e}")
+        self.browsers = []
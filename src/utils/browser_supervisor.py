@@ -0,0 +1,77 @@
+from src.extractors.tweet_extractor import is_session_error
+from src.utils.metrics import RunMetrics
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+
+class SessionUnavailableError(Exception):
+    """The session couldn't be restarted before a task, so the task didn't run"""
+
+
+class BrowserSupervisor:
+    """Keeps long-running Browser sessions healthy.
+
+    Before each task a session is recycled (restarted and logged in again
+    from the saved cookies) when it stopped answering, has run
+    recycle_every tasks, or Chrome uses more than max_memory_mb of resident
+    memory. A task that kills the driver session is caught, the session is
+    recycled and the error is not passed on, so the run continues; callers
+    are expected to have saved the task's progress and queued it again.
+    """
+
+    def __init__(
+        self,
+        recycle_every: Optional[int] = 50,
+        max_memory_mb: Optional[float] = 2048,
+        metrics=None,
+    ):
+        self.recycle_every = recycle_every
+        self.max_memory_mb = max_memory_mb
+        self.metrics = metrics or RunMetrics()
+        self._tasks: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def recycle(self, browser, reason: str):
+        logging.info(f"Recycling browser session: {reason}")
+        with self.metrics.timer("browser_recycle"):
+            browser.restart()
+        with self._lock:
+            self._tasks[id(browser)] = 0
+        self.metrics.increment("browser_recycles")
+
+    def checkup(self, browser):
+        """Recycle the session if it is dead, worn out or using too much memory"""
+        with self._lock:
+            tasks = self._tasks.get(id(browser), 0)
+        if not browser.is_alive():
+            self.recycle(browser, "session stopped responding")
+        elif self.recycle_every and tasks >= self.recycle_every:
+            self.recycle(browser, f"{tasks} tasks since last start")
+        elif self.max_memory_mb:
+            memory = browser.memory_mb()
+            if memory is not None and memory > self.max_memory_mb:
+                self.recycle(browser, f"Chrome using {memory:.0f} MB")
+
+    def wrap(self, task: Callable[[Any, Any], None]) -> Callable[[Any, Any], None]:
+        """task(browser, item) with health checks and crash recovery"""
+
+        def supervised(browser, item):
+            try:
+                self.checkup(browser)
+            except Exception as e:
+                raise SessionUnavailableError(
+                    f"Browser session unavailable for {item!r}: {e}"
+                ) from e
+            with self._lock:
+                self._tasks[id(browser)] = self._tasks.get(id(browser), 0) + 1
+            try:
+                task(browser, item)
+            except Exception as e:
+                if not is_session_error(e):
+                    raise
+                logging.error(f"Browser session died on {item!r}: {e}")
+                self.metrics.increment("browser_crashes")
+                self.recycle(browser, "driver session died")
+
+        return supervised
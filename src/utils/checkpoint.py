@@ -0,0 +1,148 @@
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+CHECKPOINT_DIR = os.path.join("data", "checkpoints")
+
+PENDING = "pending"
+PARTIAL = "partial"
+COMPLETED = "completed"
+
+
+class RunCheckpoint:
+    """Per-keyword progress of a crawl run, saved so it can be resumed.
+
+    Tracks whether each keyword is pending, partial or completed, how many
+    tweets it has collected and the oldest tweet seen so far. It also keeps
+    the reply threads still waiting to be crawled, the query planner's state
+    and the run's search_results.
+    """
+
+    def __init__(self, path: str, state: Optional[Dict] = None):
+        self.path = path
+        self.state = state or {
+            "created_at": datetime.now().isoformat(),
+            "finished": False,
+            "output_file": None,
+            "keywords": {},
+            "pending_comments": [],
+            "search_results": {"successful": [], "failed": []},
+        }
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, keywords: List[str], output_file: str) -> "RunCheckpoint":
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        checkpoint = cls(os.path.join(CHECKPOINT_DIR, f"run_{timestamp}.json"))
+        checkpoint.state["output_file"] = output_file
+        for keyword in keywords:
+            checkpoint.keyword_state(keyword)
+        checkpoint.save()
+        return checkpoint
+
+    @classmethod
+    def load(cls, path: str) -> "RunCheckpoint":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(path, json.load(f))
+
+    @classmethod
+    def unfinished(cls) -> Iterator["RunCheckpoint"]:
+        """Checkpoints of runs that can still be resumed, newest first"""
+        if not os.path.isdir(CHECKPOINT_DIR):
+            return
+        for file in sorted(os.listdir(CHECKPOINT_DIR), reverse=True):
+            if not file.endswith(".json"):
+                continue
+            try:
+                checkpoint = cls.load(os.path.join(CHECKPOINT_DIR, file))
+                if not checkpoint.state.get("finished"):
+                    yield checkpoint
+            except Exception as e:
+                logging.error(f"Error reading checkpoint {file}: {e}")
+
+    @classmethod
+    def latest_unfinished(cls) -> Optional["RunCheckpoint"]:
+        return next(cls.unfinished(), None)
+
+    @property
+    def output_file(self) -> Optional[str]:
+        return self.state.get("output_file")
+
+    @property
+    def search_results(self) -> Dict:
+        return self.state["search_results"]
+
+    @property
+    def planner_state(self) -> Optional[Dict]:
+        return self.state.get("planner")
+
+    def keyword_state(self, keyword: str) -> Dict:
+        return self.state["keywords"].setdefault(
+            keyword,
+            {
+                "status": PENDING,
+                "tweets_collected": 0,
+                "last_tweet_id": None,
+                "last_timestamp": None,
+            },
+        )
+
+    def is_completed(self, keyword: str) -> bool:
+        return self.keyword_state(keyword)["status"] == COMPLETED
+
+    def start_keyword(self, keyword: str):
+        with self._lock:
+            state = self.keyword_state(keyword)
+            if state["status"] == PENDING:
+                state["status"] = PARTIAL
+        self.save()
+
+    def record_tweets(self, keyword: str, tweets: List):
+        """Count tweets collected for keyword and track the oldest one seen"""
+        with self._lock:
+            state = self.keyword_state(keyword)
+            state["tweets_collected"] += len(tweets)
+            for tweet in tweets:
+                # Replies don't tell us how far down the timeline we are
+                if tweet.parent_tweet_url or tweet.status_id is None:
+                    continue
+                if state["last_tweet_id"] is None or tweet.status_id < state["last_tweet_id"]:
+                    state["last_tweet_id"] = tweet.status_id
+                    state["last_timestamp"] = tweet.timestamp
+        self.save()
+
+    def complete_keyword(self, keyword: str):
+        with self._lock:
+            self.keyword_state(keyword)["status"] = COMPLETED
+        self.save()
+
+    def set_pending_comments(self, pending: List[Tuple]):
+        with self._lock:
+            self.state["pending_comments"] = [list(item) for item in pending]
+
+    def set_planner_state(self, planner_state: Dict):
+        with self._lock:
+            self.state["planner"] = planner_state
+        self.save()
+
+    def finish(self):
+        with self._lock:
+            self.state["finished"] = True
+            self.state["pending_comments"] = []
+        self.save()
+
+    def save(self):
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self.state["updated_at"] = datetime.now().isoformat()
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self.state, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                logging.error(f"Error saving checkpoint: {e}")
@@ -0,0 +1,17 @@
+import json
+import logging
+import os
+from typing import Dict
+
+
+DEFAULT_CONFIG_PATH = os.path.join("config", "config.json")
+
+
+def load_config(config_path: str = DEFAULT_CONFIG_PATH) -> Dict:
+    """Load config.json, returning an empty config if it can't be read"""
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logging.error(f"Error reading config file {config_path}: {e}")
+        return {}
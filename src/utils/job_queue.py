@@ -0,0 +1,258 @@
+import json
+import logging
+import os
+import re
+import threading
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+
+DEFAULT_JOBS_DIR = os.path.join("data", "jobs")
+
+# A job's directory is its state
+QUEUED = "inbox"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+STATES = (QUEUED, RUNNING, DONE, FAILED)
+
+# Job ids are file names, so nothing that could leave the jobs directory
+JOB_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def normalize_job(job: Dict, job_id: str) -> Dict:
+    """Validate a submitted job and bring it to the stored form.
+
+    keywords holds strings or {"keyword": ..., "target": ...} objects;
+    stored jobs keep the keyword strings and move targets to their own map.
+    """
+    if not isinstance(job, dict):
+        raise ValueError("A job must be a JSON object")
+    entries = job.get("keywords")
+    if not isinstance(entries, list) or not entries:
+        raise ValueError("A job needs a non-empty list of keywords")
+    keywords, targets = [], dict(job.get("targets") or {})
+    for entry in entries:
+        if isinstance(entry, dict):
+            keyword = str(entry.get("keyword", "")).strip()
+            if "target" in entry:
+                targets[keyword] = int(entry["target"])
+        else:
+            keyword = str(entry).strip()
+        if not keyword:
+            raise ValueError(f"Invalid keyword entry: {entry!r}")
+        if keyword not in keywords:
+            keywords.append(keyword)
+
+    normalized = dict(job, id=job_id, keywords=keywords, targets=targets)
+    if normalized.get("tweets_per_keyword") is not None:
+        normalized["tweets_per_keyword"] = int(normalized["tweets_per_keyword"])
+    normalized.setdefault("submitted_at", datetime.now().isoformat())
+    return normalized
+
+
+class JobQueue:
+    """Crawl jobs kept as JSON files under root/inbox, running, done and failed.
+
+    Jobs are submitted through submit() or by dropping a JSON file into the
+    inbox directory; they are taken oldest first. Moving a file between
+    directories is atomic, so a job is never picked up twice, and a job left
+    in running/ by a daemon that died is queued again by recover(). The
+    queue also keeps the daemon's status and throughput in root/status.json.
+    """
+
+    def __init__(self, root: str = DEFAULT_JOBS_DIR):
+        self.root = root
+        for state in STATES:
+            os.makedirs(os.path.join(root, state), exist_ok=True)
+        self.stats = {
+            "started_at": datetime.now().isoformat(),
+            "current_job": None,
+            "jobs_done": 0,
+            "jobs_failed": 0,
+            "tweets": 0,
+            "crawl_seconds": 0.0,
+        }
+        self._lock = threading.Lock()
+
+    def path(self, state: str, job_id: str) -> str:
+        return os.path.join(self.root, state, f"{job_id}.json")
+
+    def write(self, path: str, job: Dict):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def submit(self, job: Dict) -> Dict:
+        """Validate a job and add it to the inbox; raises ValueError if invalid"""
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        job = normalize_job(job, f"{stamp}_{uuid.uuid4().hex[:8]}")
+        job["status"] = QUEUED
+        self.write(self.path(QUEUED, job["id"]), job)
+        logging.info(f"Queued job {job['id']} with {len(job['keywords'])} keywords")
+        return job
+
+    def recover(self):
+        """Queue again the jobs a previous daemon left running"""
+        for file in sorted(os.listdir(os.path.join(self.root, RUNNING))):
+            if file.endswith(".json"):
+                os.replace(
+                    os.path.join(self.root, RUNNING, file),
+                    os.path.join(self.root, QUEUED, file),
+                )
+                logging.info(f"Requeued interrupted job {file[:-len('.json')]}")
+
+    def next_job(self) -> Optional[Dict]:
+        """Claim the oldest queued job, or None if the inbox is empty"""
+        inbox = os.path.join(self.root, QUEUED)
+        files = [file for file in os.listdir(inbox) if file.endswith(".json")]
+        files.sort(key=lambda file: os.path.getmtime(os.path.join(inbox, file)))
+        for file in files:
+            job_id = file[: -len(".json")]
+            running_path = self.path(RUNNING, job_id)
+            try:
+                os.replace(os.path.join(inbox, file), running_path)
+            except FileNotFoundError:
+                continue
+            try:
+                with open(running_path, "r", encoding="utf-8") as f:
+                    job = normalize_job(json.load(f), job_id)
+            except Exception as e:
+                logging.error(f"Rejecting job {job_id}: {e}")
+                os.replace(running_path, self.path(FAILED, job_id))
+                with self._lock:
+                    self.stats["jobs_failed"] += 1
+                continue
+            job["status"] = RUNNING
+            job["started_at"] = datetime.now().isoformat()
+            self.write(running_path, job)
+            with self._lock:
+                self.stats["current_job"] = job_id
+            self.save_status()
+            return job
+        return None
+
+    def update(self, job: Dict):
+        """Save a running job's progress"""
+        self.write(self.path(RUNNING, job["id"]), job)
+
+    def finish(self, job: Dict, result: Dict):
+        job.update(status=DONE, finished_at=datetime.now().isoformat(), result=result)
+        self.move(job, DONE)
+        with self._lock:
+            self.stats["jobs_done"] += 1
+            self.stats["tweets"] += result.get("tweets", 0)
+            self.stats["crawl_seconds"] += result.get("seconds", 0.0)
+            self.stats["current_job"] = None
+        self.save_status()
+
+    def fail(self, job: Dict, error: str):
+        job.update(status=FAILED, finished_at=datetime.now().isoformat(), error=error)
+        self.move(job, FAILED)
+        with self._lock:
+            self.stats["jobs_failed"] += 1
+            self.stats["current_job"] = None
+        self.save_status()
+
+    def move(self, job: Dict, state: str):
+        self.write(self.path(state, job["id"]), job)
+        try:
+            os.remove(self.path(RUNNING, job["id"]))
+        except FileNotFoundError:
+            pass
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        if not JOB_ID_PATTERN.match(job_id):
+            return None
+        for state in STATES:
+            path = self.path(state, job_id)
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    return dict(json.load(f), status=state)
+        return None
+
+    def list(self, state: str) -> List[str]:
+        return sorted(
+            file[: -len(".json")]
+            for file in os.listdir(os.path.join(self.root, state))
+            if file.endswith(".json")
+        )
+
+    def status(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+        seconds = stats["crawl_seconds"]
+        stats["tweets_per_minute"] = (
+            round(stats["tweets"] / seconds * 60, 1) if seconds else 0.0
+        )
+        stats["crawl_seconds"] = round(seconds, 3)
+        stats["queued"] = len(self.list(QUEUED))
+        return stats
+
+    def save_status(self):
+        try:
+            self.write(os.path.join(self.root, "status.json"), self.status())
+        except Exception as e:
+            logging.error(f"Error saving daemon status: {e}")
+
+
+class JobServer:
+    """Localhost HTTP front end to a JobQueue.
+
+    POST /jobs submits a job, GET /jobs/<id> returns it and GET /status
+    returns the daemon's status and throughput.
+    """
+
+    def __init__(self, jobs: JobQueue, port: int = 8765, host: str = "127.0.0.1"):
+        self.jobs = jobs
+        self.server = ThreadingHTTPServer((host, port), self.handler())
+        self.thread: Optional[threading.Thread] = None
+
+    def handler(self):
+        jobs = self.jobs
+
+        class Handler(BaseHTTPRequestHandler):
+            def reply(self, code: int, body: Dict):
+                payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                if self.path == "/status":
+                    return self.reply(200, jobs.status())
+                if self.path.startswith("/jobs/"):
+                    job = jobs.get(self.path[len("/jobs/") :])
+                    if job:
+                        return self.reply(200, job)
+                self.reply(404, {"error": "not found"})
+
+            def do_POST(self):
+                if self.path != "/jobs":
+                    return self.reply(404, {"error": "not found"})
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    job = jobs.submit(json.loads(self.rfile.read(length)))
+                except (ValueError, TypeError) as e:
+                    return self.reply(400, {"error": str(e)})
+                self.reply(202, job)
+
+            def log_message(self, format, *args):
+                logging.debug(f"Job server: {format % args}")
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        host, port = self.server.server_address[:2]
+        logging.info(f"Accepting crawl jobs on http://{host}:{port}/jobs")
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
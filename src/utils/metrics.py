@@ -0,0 +1,213 @@
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
+
+
+PROMETHEUS_PREFIX = "tweets_scraper"
+
+
+def escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class RunMetrics:
+    """Timers and counters for one crawl run.
+
+    Phases (authenticate, search, comments, save...) are timed with timer(),
+    WebDriver commands are counted by instrument_driver(), and per-keyword
+    throughput is recorded by record_keyword(). The report can be exported as
+    JSON and as a Prometheus textfile.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.counters: Dict[str, float] = {}
+        self.timers: Dict[str, Dict[str, float]] = {}
+        self.keywords: Dict[str, Dict] = {}
+        self._driver_calls = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Start a new run: clear timers, counters and keyword stats.
+
+        Instrumented drivers stay instrumented, so long-lived sessions (as in
+        the job daemon) keep reporting into the new run.
+        """
+        with self._lock:
+            self.started_at = time.time()
+            self.counters = {}
+            self.timers = {}
+            self.keywords = {}
+
+    def increment(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            timer = self.timers.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+            timer["count"] += 1
+            timer["total"] += seconds
+            timer["max"] = max(timer["max"], seconds)
+
+    @contextmanager
+    def timer(self, name: str):
+        started = time.time()
+        try:
+            yield
+        finally:
+            self.observe(name, time.time() - started)
+
+    def instrument_driver(self, driver):
+        """Count every command the driver sends, including element lookups"""
+        if driver in self._driver_calls:
+            return
+        self._driver_calls[driver] = 0
+        execute = driver.execute
+
+        def counting_execute(driver_command, params=None):
+            with self._lock:
+                self._driver_calls[driver] = self._driver_calls.get(driver, 0) + 1
+                self.counters["webdriver_calls"] = (
+                    self.counters.get("webdriver_calls", 0) + 1
+                )
+            return execute(driver_command, params)
+
+        driver.execute = counting_execute
+
+    def driver_calls(self, driver) -> int:
+        with self._lock:
+            return self._driver_calls.get(driver, 0)
+
+    def record_keyword(
+        self,
+        keyword: str,
+        tweets: int,
+        seconds: float,
+        candidates: int = 0,
+        duplicates: int = 0,
+        empty_scrolls: int = 0,
+        scrolls: int = 0,
+        webdriver_calls: int = 0,
+    ):
+        with self._lock:
+            stats = self.keywords.setdefault(
+                keyword,
+                {
+                    "tweets": 0,
+                    "seconds": 0.0,
+                    "candidates": 0,
+                    "duplicates": 0,
+                    "scrolls": 0,
+                    "empty_scrolls": 0,
+                    "webdriver_calls": 0,
+                },
+            )
+            stats["tweets"] += tweets
+            stats["seconds"] += seconds
+            stats["candidates"] += candidates
+            stats["duplicates"] += duplicates
+            stats["scrolls"] += scrolls
+            stats["empty_scrolls"] += empty_scrolls
+            stats["webdriver_calls"] += webdriver_calls
+
+    def report(self, waits: Optional[Dict] = None) -> Dict:
+        with self._lock:
+            keywords = {}
+            for keyword, stats in self.keywords.items():
+                keywords[keyword] = dict(
+                    stats,
+                    seconds=round(stats["seconds"], 3),
+                    tweets_per_second=round(stats["tweets"] / stats["seconds"], 3)
+                    if stats["seconds"]
+                    else 0.0,
+                    duplicate_rate=round(stats["duplicates"] / stats["candidates"], 3)
+                    if stats["candidates"]
+                    else 0.0,
+                )
+            return {
+                "started_at": datetime.fromtimestamp(self.started_at).isoformat(),
+                "duration_seconds": round(time.time() - self.started_at, 3),
+                "counters": dict(self.counters),
+                "phases": {
+                    name: {
+                        "count": timer["count"],
+                        "total": round(timer["total"], 3),
+                        "max": round(timer["max"], 3),
+                    }
+                    for name, timer in self.timers.items()
+                },
+                "keywords": keywords,
+                "waits": waits or {},
+            }
+
+    def export_json(self, filename: str, waits: Optional[Dict] = None) -> bool:
+        try:
+            os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+            with open(filename, "w", encoding="utf-8") as f:
+                json.dump(self.report(waits), f, ensure_ascii=False, indent=2)
+            logging.info(f"Run metrics saved to {filename}")
+            return True
+        except Exception as e:
+            logging.error(f"Error saving run metrics: {e}")
+            return False
+
+    def export_prometheus(self, filename: str, waits: Optional[Dict] = None) -> bool:
+        """Write the report in the node exporter textfile format.
+
+        The file is replaced atomically so the exporter never reads half of it.
+        """
+        report = self.report(waits)
+        p = PROMETHEUS_PREFIX
+        lines = [
+            f"# TYPE {p}_run_duration_seconds gauge",
+            f"{p}_run_duration_seconds {report['duration_seconds']}",
+            f"# TYPE {p}_last_run_timestamp_seconds gauge",
+            f"{p}_last_run_timestamp_seconds {round(time.time(), 3)}",
+        ]
+        for name, value in sorted(report["counters"].items()):
+            lines.append(f"# TYPE {p}_{name}_total counter")
+            lines.append(f"{p}_{name}_total {value}")
+
+        phase_metrics = (("total", "phase_seconds_total"), ("count", "phase_runs_total"))
+        for field, metric in phase_metrics:
+            lines.append(f"# TYPE {p}_{metric} counter")
+            for name, timer in sorted(report["phases"].items()):
+                label = f'{{phase="{escape_label(name)}"}}'
+                lines.append(f"{p}_{metric}{label} {timer[field]}")
+
+        lines.append(f"# TYPE {p}_wait_seconds_total counter")
+        for name, stats in sorted(report["waits"].items()):
+            label = f'{{wait="{escape_label(name)}"}}'
+            lines.append(f"{p}_wait_seconds_total{label} {stats['total']}")
+
+        keyword_metrics = (
+            ("tweets", "keyword_tweets"),
+            ("tweets_per_second", "keyword_tweets_per_second"),
+            ("duplicate_rate", "keyword_duplicate_ratio"),
+            ("empty_scrolls", "keyword_empty_scrolls"),
+            ("webdriver_calls", "keyword_webdriver_calls"),
+        )
+        for field, metric in keyword_metrics:
+            lines.append(f"# TYPE {p}_{metric} gauge")
+            for keyword, stats in sorted(report["keywords"].items()):
+                label = f'{{keyword="{escape_label(keyword)}"}}'
+                lines.append(f"{p}_{metric}{label} {stats[field]}")
+
+        try:
+            os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+            tmp_path = f"{filename}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            os.replace(tmp_path, filename)
+            logging.info(f"Prometheus metrics written to {filename}")
+            return True
+        except Exception as e:
+            logging.error(f"Error writing Prometheus metrics: {e}")
+            return False
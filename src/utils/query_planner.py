@@ -0,0 +1,535 @@
+import json
+import logging
+import os
+import threading
+import unicodedata
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+
+DEFAULT_DENSITY_PATH = os.path.join("data", "index", "query_density.json")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase text and strip accents so "Guayaquil" matches "guayaquíl" """
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def parse_timestamp(timestamp: Optional[str]) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return None
+
+
+def load_densities(path: str = DEFAULT_DENSITY_PATH) -> Dict[str, float]:
+    """Tweets per day observed for each keyword in earlier runs"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logging.error(f"Error reading keyword densities {path}: {e}")
+        return {}
+
+
+def save_densities(densities: Dict[str, float], path: str = DEFAULT_DENSITY_PATH):
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        merged = dict(load_densities(path), **densities)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(merged, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logging.error(f"Error saving keyword densities: {e}")
+
+
+class QueryShard:
+    """One search: a keyword, or several OR-ed together, over a date window.
+
+    since is inclusive and until exclusive, as in the search operators. While
+    the shard runs, observe() tracks how many tweets each keyword got and the
+    oldest one seen, so a retried or follow-up shard continues below it with
+    max_id instead of scrolling through the same tweets again. stop_below is
+    the high-water mark an incremental search stops at.
+    """
+
+    def __init__(
+        self,
+        keywords: List[str],
+        since: Optional[date] = None,
+        until: Optional[date] = None,
+        target: int = 100,
+        max_id: Optional[int] = None,
+        attempts: int = 0,
+        stop_below: Optional[int] = None,
+        rate_limited: int = 0,
+    ):
+        self.keywords = list(keywords)
+        self.since = since
+        self.until = until
+        self.target = target
+        self.max_id = max_id
+        self.attempts = attempts
+        # Retries after rate limits, which don't count as attempts
+        self.rate_limited = rate_limited
+        self.stop_below = stop_below
+        self.collected = {keyword: 0 for keyword in self.keywords}
+        self.newest: Dict[str, List] = {}
+        self.oldest_timestamp: Optional[str] = None
+        self._terms = [
+            [term.strip('"') for term in normalize_text(keyword).split()]
+            for keyword in self.keywords
+        ]
+
+    @property
+    def label(self) -> str:
+        return " OR ".join(self.keywords)
+
+    @property
+    def query(self) -> str:
+        if len(self.keywords) == 1:
+            parts = [self.keywords[0]]
+        else:
+            parts = [" OR ".join(f"({keyword})" for keyword in self.keywords)]
+        if self.since:
+            parts.append(f"since:{self.since.isoformat()}")
+        if self.until:
+            parts.append(f"until:{self.until.isoformat()}")
+        if self.max_id:
+            parts.append(f"max_id:{self.max_id}")
+        return " ".join(parts)
+
+    @property
+    def days(self) -> Optional[int]:
+        if self.since and self.until:
+            return (self.until - self.since).days
+        return None
+
+    def attribute(self, tweet) -> str:
+        """Keyword of this shard a tweet was found for.
+
+        The first keyword whose terms all appear in the text wins, otherwise
+        the one with most terms in it.
+        """
+        if len(self.keywords) == 1:
+            return self.keywords[0]
+        text = normalize_text(f"{tweet.username} {tweet.text}")
+        best, best_matches = self.keywords[0], -1
+        for keyword, terms in zip(self.keywords, self._terms):
+            matches = sum(1 for term in terms if term in text)
+            if matches == len(terms):
+                return keyword
+            if matches > best_matches:
+                best, best_matches = keyword, matches
+        return best
+
+    def observe(self, tweets: List):
+        for tweet in tweets:
+            # Replies don't tell us how far down the timeline we are
+            if tweet.parent_tweet_url or tweet.keyword not in self.collected:
+                continue
+            self.collected[tweet.keyword] += 1
+            if not tweet.status_id:
+                continue
+            newest = self.newest.get(tweet.keyword)
+            if newest is None or tweet.status_id > newest[0]:
+                self.newest[tweet.keyword] = [tweet.status_id, tweet.timestamp]
+            if self.max_id is None or tweet.status_id <= self.max_id:
+                self.max_id = tweet.status_id - 1
+                self.oldest_timestamp = tweet.timestamp
+
+    def to_dict(self) -> Dict:
+        return {
+            "keywords": self.keywords,
+            "since": self.since.isoformat() if self.since else None,
+            "until": self.until.isoformat() if self.until else None,
+            "target": self.target,
+            "max_id": self.max_id,
+            "attempts": self.attempts,
+            "stop_below": self.stop_below,
+            "rate_limited": self.rate_limited,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "QueryShard":
+        return cls(
+            data["keywords"],
+            since=date.fromisoformat(data["since"]) if data.get("since") else None,
+            until=date.fromisoformat(data["until"]) if data.get("until") else None,
+            target=data.get("target", 100),
+            max_id=data.get("max_id"),
+            attempts=data.get("attempts", 0),
+            stop_below=data.get("stop_below"),
+            rate_limited=data.get("rate_limited", 0),
+        )
+
+    def __repr__(self) -> str:
+        return f"QueryShard({self.query!r})"
+
+
+class QueryPlanner:
+    """Splits keywords into shards that can be searched in parallel and retried.
+
+    Each keyword walks back from today in since:/until: windows down to
+    lookback_days ago. Windows start at window_days and are resized after
+    every shard so that one holds about tweets_per_shard tweets at the
+    density observed so far. Keywords that earlier runs found to have fewer
+    than merge_below tweets a day are OR-ed together, up to max_merged per
+    query. A shard that fills its target before the window ends is followed
+    by one continuing below its oldest tweet; a failed shard is retried up to
+    max_attempts times, and one stopped by rate limits up to
+    max_rate_limit_retries times. A shard given up on is saved with the
+    pending ones, so a resumed run tries it again, and its keywords are not
+    reported done.
+
+    marks are the keywords' high-water marks from earlier runs. When given,
+    searches stop at a keyword's mark and windows don't go back past the day
+    of it; high_water_marks() then returns the marks this run can advance to.
+
+    With enabled=False every keyword is a single shard without a date window,
+    which is how keywords were searched before.
+    """
+
+    def __init__(
+        self,
+        keywords: List[str],
+        target_tweets: int = 100,
+        enabled: bool = True,
+        window_days: int = 7,
+        min_window_days: int = 1,
+        max_window_days: int = 30,
+        lookback_days: int = 30,
+        tweets_per_shard: int = 200,
+        merge_below: float = 5,
+        max_merged: int = 3,
+        max_attempts: int = 3,
+        max_rate_limit_retries: int = 5,
+        densities: Optional[Dict[str, float]] = None,
+        marks: Optional[Dict[str, Dict]] = None,
+        today: Optional[date] = None,
+        targets: Optional[Dict[str, int]] = None,
+    ):
+        self.target_tweets = target_tweets
+        # Per-keyword overrides of target_tweets
+        self.targets = dict(targets or {})
+        self.enabled = enabled
+        self.window_days = window_days
+        self.min_window_days = max(1, min_window_days)
+        self.max_window_days = max(self.min_window_days, max_window_days)
+        self.tweets_per_shard = tweets_per_shard
+        self.merge_below = merge_below
+        self.max_merged = max(1, max_merged)
+        self.max_attempts = max(1, max_attempts)
+        self.max_rate_limit_retries = max(0, max_rate_limit_retries)
+        self.densities = dict(densities or {})
+        self.marks = dict(marks or {})
+        today = today or datetime.now(timezone.utc).date()
+        self.start = today + timedelta(days=1)  # until: is exclusive
+        self.horizon = today - timedelta(days=lookback_days)
+        self.streams = [
+            self.new_stream(group) for group in self.group_keywords(keywords)
+        ]
+        self.queued: List[QueryShard] = []
+        self.running: Dict[int, QueryShard] = {}
+        # Shards given up on, left for a resumed run
+        self.abandoned: List[QueryShard] = []
+        self._lock = threading.Lock()
+
+    def group_keywords(self, keywords: List[str]) -> List[List[str]]:
+        """Merge keywords known to be low-volume into combined queries"""
+        if not self.enabled:
+            return [[keyword] for keyword in keywords]
+
+        groups, merged, merged_density = [], [], 0.0
+        for keyword in keywords:
+            density = self.densities.get(keyword)
+            if density is None or density >= self.merge_below:
+                groups.append([keyword])
+                continue
+            if merged and (
+                len(merged) >= self.max_merged
+                or merged_density + density >= self.merge_below
+            ):
+                groups.append(merged)
+                merged, merged_density = [], 0.0
+            merged.append(keyword)
+            merged_density += density
+        if merged:
+            groups.append(merged)
+        return groups
+
+    def new_stream(self, keywords: List[str]) -> Dict:
+        known = [self.densities[k] for k in keywords if k in self.densities]
+        stream = {
+            "keywords": keywords,
+            "cursor": self.start.isoformat(),
+            "density": sum(known) if known else None,
+            "collected": {keyword: 0 for keyword in keywords},
+            "exhausted": False,
+            "stop_below": None,
+            "horizon": self.horizon.isoformat(),
+            "newest": {},
+            "mark_reached": False,
+            # A shard timed out, leaving a gap
+            "incomplete": False,
+        }
+        marks = [self.marks.get(keyword) for keyword in keywords]
+        if all(marks):
+            # Merged keywords search down to the oldest of their marks
+            oldest = min(marks, key=lambda mark: mark["status_id"])
+            stream["stop_below"] = oldest["status_id"]
+            mark_time = parse_timestamp(oldest.get("timestamp"))
+            if mark_time:
+                horizon = max(self.horizon, mark_time.date())
+                stream["horizon"] = horizon.isoformat()
+        return stream
+
+    def stream_for(self, shard: QueryShard) -> Dict:
+        for stream in self.streams:
+            if stream["keywords"] == shard.keywords:
+                return stream
+        raise KeyError(shard.label)
+
+    def remaining(self, stream: Dict) -> int:
+        return sum(
+            max(self.targets.get(keyword, self.target_tweets) - collected, 0)
+            for keyword, collected in stream["collected"].items()
+        )
+
+    def window_size(self, stream: Dict) -> int:
+        if stream["density"] is None:
+            return self.window_days
+        if stream["density"] == 0:
+            return self.max_window_days
+        days = round(self.tweets_per_shard / stream["density"])
+        return min(max(days, self.min_window_days), self.max_window_days)
+
+    def in_flight(self, stream: Dict) -> int:
+        return sum(
+            1
+            for shard in list(self.running.values()) + self.queued
+            if shard.keywords == stream["keywords"]
+        )
+
+    def is_finished(self, stream: Dict) -> bool:
+        done = stream["exhausted"] or self.remaining(stream) == 0
+        abandoned = any(
+            shard.keywords == stream["keywords"] for shard in self.abandoned
+        )
+        return done and self.in_flight(stream) == 0 and not abandoned
+
+    def next_shard(self) -> Optional[QueryShard]:
+        """Next shard to search, or None when every keyword is done"""
+        with self._lock:
+            if self.queued:
+                shard = self.queued.pop(0)
+            else:
+                shard = self.issue()
+            if shard:
+                self.running[id(shard)] = shard
+            return shard
+
+    def has_running(self) -> bool:
+        """True while a shard is out, which may still queue a follow-up"""
+        with self._lock:
+            return bool(self.running)
+
+    def issue(self) -> Optional[QueryShard]:
+        active = [
+            stream
+            for stream in self.streams
+            if not stream["exhausted"] and self.remaining(stream) > 0
+        ]
+        if not active:
+            return None
+        # Spread parallel sessions over keywords before going deeper in one
+        stream = min(active, key=self.in_flight)
+
+        if not self.enabled:
+            stream["exhausted"] = True
+            return QueryShard(
+                stream["keywords"],
+                target=self.remaining(stream),
+                stop_below=stream["stop_below"],
+            )
+
+        horizon = date.fromisoformat(stream["horizon"])
+        until = date.fromisoformat(stream["cursor"])
+        since = max(until - timedelta(days=self.window_size(stream)), horizon)
+        stream["cursor"] = since.isoformat()
+        if since <= horizon:
+            stream["exhausted"] = True
+        return QueryShard(
+            stream["keywords"],
+            since=since,
+            until=until,
+            target=min(self.tweets_per_shard, self.remaining(stream)),
+            stop_below=stream["stop_below"],
+        )
+
+    def complete(
+        self,
+        shard: QueryShard,
+        target_reached: bool,
+        mark_reached: bool = False,
+        timed_out: bool = False,
+    ) -> List[str]:
+        """Record a finished shard; returns the keywords that are now done"""
+        with self._lock:
+            self.running.pop(id(shard), None)
+            stream = self.stream_for(shard)
+            self.merge_progress(stream, shard)
+            if timed_out:
+                stream["incomplete"] = True
+            if mark_reached:
+                # Everything below was collected by an earlier run
+                stream["mark_reached"] = True
+                stream["exhausted"] = True
+            elif shard.days:
+                self.update_density(stream, shard, target_reached)
+                if target_reached and self.remaining(stream) > 0:
+                    # The window had more tweets than the target: carry on
+                    # below the oldest one in a new shard
+                    self.queued.append(
+                        QueryShard(
+                            shard.keywords,
+                            since=shard.since,
+                            until=shard.until,
+                            target=min(self.tweets_per_shard, self.remaining(stream)),
+                            max_id=shard.max_id,
+                            stop_below=shard.stop_below,
+                        )
+                    )
+            return stream["keywords"] if self.is_finished(stream) else []
+
+    def fail(self, shard: QueryShard, penalize: bool = True) -> List[str]:
+        """Queue a failed shard for another attempt; returns keywords now done.
+
+        With penalize=False (e.g. the search was rate limited) the attempt
+        doesn't count towards max_attempts but towards max_rate_limit_retries.
+        """
+        with self._lock:
+            self.running.pop(id(shard), None)
+            stream = self.stream_for(shard)
+            self.merge_progress(stream, shard)
+            # The retry picks up below max_id for whatever is still missing
+            shard.target = max(1, shard.target - sum(shard.collected.values()))
+            shard.collected = {keyword: 0 for keyword in shard.keywords}
+            if penalize:
+                shard.attempts += 1
+            else:
+                shard.rate_limited += 1
+            if (
+                shard.attempts < self.max_attempts
+                and shard.rate_limited <= self.max_rate_limit_retries
+            ):
+                logging.warning(f"Retrying {shard} (attempt {shard.attempts + 1})")
+                self.queued.append(shard)
+            else:
+                logging.error(
+                    f"Giving up on {shard} after {shard.attempts} attempts "
+                    f"and {shard.rate_limited} rate limits; a resumed run "
+                    f"tries it again"
+                )
+                self.abandoned.append(shard)
+            return stream["keywords"] if self.is_finished(stream) else []
+
+    def merge_progress(self, stream: Dict, shard: QueryShard):
+        for keyword, collected in shard.collected.items():
+            stream["collected"][keyword] += collected
+        for keyword, newest in shard.newest.items():
+            current = stream["newest"].get(keyword)
+            if current is None or newest[0] > current[0]:
+                stream["newest"][keyword] = newest
+
+    def high_water_marks(self, keywords: List[str]) -> Dict[str, Dict]:
+        """New marks for the given finished keywords.
+
+        A mark only moves up when nothing between it and the newest tweet
+        was left out: the search reached the old mark, ran out of tweets or
+        the keyword had no mark yet. A keyword that stopped at its target
+        keeps its old mark, so the next run fills the gap, and so does one
+        with a shard that timed out or was given up on.
+        """
+        marks = {}
+        with self._lock:
+            for stream in self.streams:
+                if stream["incomplete"]:
+                    continue
+                covered = stream["mark_reached"] or self.remaining(stream) > 0
+                for keyword in stream["keywords"]:
+                    newest = stream["newest"].get(keyword)
+                    if keyword not in keywords or newest is None:
+                        continue
+                    if covered or keyword not in self.marks:
+                        marks[keyword] = {
+                            "status_id": newest[0],
+                            "timestamp": newest[1],
+                        }
+        return marks
+
+    def update_density(self, stream: Dict, shard: QueryShard, target_reached: bool):
+        days = shard.days
+        oldest = parse_timestamp(shard.oldest_timestamp)
+        if target_reached and oldest:
+            # Only the part of the window above the oldest tweet was covered
+            end = datetime.combine(shard.until, datetime.min.time(), timezone.utc)
+            days = min(max((end - oldest).total_seconds() / 86400, 1 / 24), days)
+
+        observed = sum(shard.collected.values()) / days
+        if stream["density"] is None:
+            stream["density"] = observed
+        else:
+            stream["density"] = (stream["density"] + observed) / 2
+        for keyword, collected in shard.collected.items():
+            previous = self.densities.get(keyword)
+            density = collected / days
+            self.densities[keyword] = (
+                density if previous is None else (previous + density) / 2
+            )
+
+    def to_dict(self) -> Dict:
+        """Planner state, with running shards saved as pending ones"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "targets": dict(self.targets),
+                "start": self.start.isoformat(),
+                "horizon": self.horizon.isoformat(),
+                "streams": [
+                    dict(stream, collected=dict(stream["collected"]))
+                    for stream in self.streams
+                ],
+                "pending": [
+                    shard.to_dict()
+                    for shard in list(self.running.values()) + self.queued
+                ]
+                # A resumed run gives abandoned shards their retries again
+                + [
+                    dict(shard.to_dict(), attempts=0, rate_limited=0)
+                    for shard in self.abandoned
+                ],
+            }
+
+    @classmethod
+    def from_dict(cls, state: Dict, **settings) -> "QueryPlanner":
+        settings = dict(settings, enabled=state.get("enabled", True))
+        if "targets" in state:
+            settings["targets"] = state["targets"]
+        planner = cls([], **settings)
+        planner.start = date.fromisoformat(state["start"])
+        planner.horizon = date.fromisoformat(state["horizon"])
+        planner.streams = state["streams"]
+        for stream in planner.streams:
+            # Plans saved before incremental runs existed
+            stream.setdefault("stop_below", None)
+            stream.setdefault("horizon", state["horizon"])
+            stream.setdefault("newest", {})
+            stream.setdefault("mark_reached", False)
+            stream.setdefault("incomplete", False)
+        planner.queued = [QueryShard.from_dict(data) for data in state["pending"]]
+        return planner
@@ -0,0 +1,206 @@
+from src.utils.selectors import RETRY_BUTTON, SELECTORS
+import json
+import logging
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+# Labels of the button the site shows in place of the timeline when the
+# account is rate limited or the timeline failed to load, in English and
+# Spanish. Checked lowercased against the whole label.
+RETRY_LABELS = ["retry", "try again", "reintentar", "volver a intentar"]
+
+# Looks for that button among the elements matching arguments[0], in order.
+# Only the button's own label is read, and never inside a tweet, so tweet
+# text or an ordinary end of timeline doesn't count.
+DETECT_RATE_LIMIT_SCRIPT = """
+const [selectors, labels] = arguments;
+for (const selector of selectors) {
+    let buttons = [];
+    try {
+        buttons = document.querySelectorAll(selector);
+    } catch (e) {}
+    for (const button of buttons) {
+        if (button.closest("article")) continue;
+        const label = button.innerText.trim();
+        if (labels.includes(label.toLowerCase())) return `"${label}" button shown`;
+    }
+}
+return null;
+"""
+
+# Failed searches with this reason found nothing; other failures (errors,
+# rate limits) say nothing about a keyword's yield
+NO_RESULTS_REASON = "No new tweets found"
+
+SEARCH_RESULTS_PATTERN = re.compile(r"^search_results_\d{8}_\d{6}\.json$")
+
+
+class RateLimitError(Exception):
+    """The site refused to serve more results for now"""
+
+
+def detect_rate_limit(driver) -> Optional[str]:
+    """Why the page looks rate limited: its retry button is shown; else None"""
+    try:
+        return driver.execute_script(
+            DETECT_RATE_LIMIT_SCRIPT, SELECTORS[RETRY_BUTTON], RETRY_LABELS
+        )
+    except Exception as e:
+        logging.error(f"Error checking for rate limits: {e}")
+        return None
+
+
+class TokenBucket:
+    """Request budget shared by every session: rate per second, up to burst"""
+
+    def __init__(self, rate: float, burst: int = 10):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """Take a token, returning 0, or how long to wait until one is free"""
+        with self._lock:
+            now = time.monotonic()
+            refill = (now - self.updated) * self.rate
+            self.tokens = min(self.burst, self.tokens + refill)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+class RateLimitScheduler:
+    """Paces requests from all sessions and backs off when rate limited.
+
+    acquire() is called for every request that hits the search or
+    conversation API: before page loads, and after scroll steps that made
+    the page fetch more, so the next request pays for them. Scrolls through
+    tweets already loaded are free. It waits for a token from the shared
+    bucket and for any cooldown in progress. When a session hits a
+    rate limit, report_limit() starts a cooldown for every session, doubling
+    from backoff_base up to backoff_max seconds with full jitter for each
+    limit in a row; report_success() resets the streak.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = 30,
+        burst: int = 10,
+        backoff_base: float = 30,
+        backoff_max: float = 900,
+        metrics=None,
+    ):
+        self.bucket = TokenBucket(requests_per_minute / 60, burst)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.metrics = metrics
+        self.consecutive_limits = 0
+        self.resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def backoff(self, attempt: int) -> float:
+        ceiling = min(self.backoff_max, self.backoff_base * 2**attempt)
+        return random.uniform(ceiling / 2, ceiling)
+
+    def acquire(self):
+        started = time.time()
+        while True:
+            with self._lock:
+                cooldown = self.resume_at - time.time()
+            wait = cooldown if cooldown > 0 else self.bucket.try_acquire()
+            if wait <= 0:
+                break
+            time.sleep(wait)
+        if self.metrics is not None:
+            self.metrics.observe("rate_limit_wait", time.time() - started)
+
+    def report_limit(self, reason: str):
+        with self._lock:
+            delay = self.backoff(self.consecutive_limits)
+            self.consecutive_limits += 1
+            self.resume_at = max(self.resume_at, time.time() + delay)
+        logging.warning(
+            f"Rate limited ({reason}); pausing all sessions for {delay:.0f}s"
+        )
+        if self.metrics is not None:
+            self.metrics.increment("rate_limits")
+
+    def report_success(self):
+        with self._lock:
+            self.consecutive_limits = 0
+
+
+def historical_yields(
+    output_dir: str = os.path.join("data", "output"),
+    store_path: Optional[str] = None,
+) -> Dict[str, float]:
+    """Mean tweets found per run for each keyword in past search_results.
+
+    A run's searches for a keyword (one per date window or retry) are added
+    up first, so how the run was sharded doesn't matter. Reads the
+    search_results files still in output_dir and, when given, the runs
+    merged into a compaction store. Merged "a OR b" searches recorded by
+    older versions match no keyword and are ignored.
+    """
+    runs: Dict[Tuple[str, str], int] = {}
+
+    def add(run: str, keyword: str, tweets_found: int):
+        runs[(run, keyword)] = runs.get((run, keyword), 0) + tweets_found
+
+    file_runs = set()
+    if os.path.isdir(output_dir):
+        for file in sorted(os.listdir(output_dir)):
+            if not SEARCH_RESULTS_PATTERN.match(file):
+                continue
+            run = file[len("search_results_") : -len(".json")]
+            file_runs.add(run)
+            try:
+                with open(os.path.join(output_dir, file), "r", encoding="utf-8") as f:
+                    results = json.load(f)
+                for entry in results.get("successful", []):
+                    add(run, entry["keyword"], entry.get("tweets_found", 0))
+                for entry in results.get("failed", []):
+                    if entry.get("reason") == NO_RESULTS_REASON:
+                        add(run, entry["keyword"], 0)
+            except Exception as e:
+                logging.error(f"Error reading search results {file}: {e}")
+
+    if store_path and os.path.exists(store_path):
+        try:
+            conn = sqlite3.connect(store_path)
+            try:
+                rows = conn.execute(
+                    "SELECT run, keyword, COALESCE(tweets_found, 0) "
+                    "FROM search_results WHERE status = 'successful' OR reason = ?",
+                    (NO_RESULTS_REASON,),
+                ).fetchall()
+            finally:
+                conn.close()
+            for run, keyword, tweets_found in rows:
+                # Files compacted but not deleted were read above
+                if run not in file_runs:
+                    add(run, keyword, tweets_found)
+        except Exception as e:
+            logging.error(f"Error reading search results from {store_path}: {e}")
+
+    totals: Dict[str, List[int]] = {}
+    for (run, keyword), tweets_found in runs.items():
+        totals.setdefault(keyword, []).append(tweets_found)
+    return {keyword: sum(found) / len(found) for keyword, found in totals.items()}
+
+
+def order_by_yield(keywords: List[str], yields: Dict[str, float]) -> List[str]:
+    """Highest-yield keywords first; unknown ones rank as an average keyword"""
+    known = [yields[k] for k in keywords if k in yields]
+    prior = sum(known) / len(known) if known else 0.0
+    return sorted(keywords, key=lambda k: yields.get(k, prior), reverse=True)
@@ -0,0 +1,57 @@
+from typing import Dict, List
+
+
+# Names of the things SearcherDriver looks up
+TWEET = "tweet"
+REPLY = "reply"
+USERNAME = "username"
+TWEET_TEXT = "tweet_text"
+TIMESTAMP = "timestamp"
+REPLIES = "replies"
+RETWEETS = "retweets"
+LIKES = "likes"
+LOGIN_USERNAME = "login_username"
+LOGIN_PASSWORD = "login_password"
+HOME_LINK = "home_link"
+RETRY_BUTTON = "retry_button"
+
+# Fields read from every tweet article, in the order they are looked up
+TWEET_FIELDS = [USERNAME, TWEET_TEXT, TIMESTAMP, REPLIES, RETWEETS, LIKES]
+
+# CSS selectors for each name, most specific first. Later entries are
+# fallbacks for when the site renames classes or test IDs; whichever one
+# matches is remembered for the rest of the session. Field selectors are
+# searched inside a tweet article.
+SELECTORS: Dict[str, List[str]] = {
+    TWEET: ['article[data-testid="tweet"]', 'article[role="article"]'],
+    REPLY: [
+        'div[data-testid="cellInnerDiv"]:not(:first-child) article[data-testid="tweet"]',
+        'div[data-testid="cellInnerDiv"]:not(:first-child) article[role="article"]',
+    ],
+    USERNAME: [
+        '[data-testid="User-Name"] div.css-175oi2r.r-1ez5h0i div.r-1wbh5a2 span',
+        '[data-testid="User-Name"] a[tabindex="-1"] span',
+        '[data-testid="User-Name"] a[role="link"]:not(:has(time)) span',
+    ],
+    TWEET_TEXT: ['[data-testid="tweetText"]', "div[lang]"],
+    TIMESTAMP: ["time[datetime]"],
+    REPLIES: ['[data-testid="reply"]', 'button[aria-label*="repl" i]'],
+    RETWEETS: [
+        '[data-testid="retweet"]',
+        '[data-testid="unretweet"]',
+        'button[aria-label*="repost" i]',
+    ],
+    LIKES: [
+        '[data-testid="like"]',
+        '[data-testid="unlike"]',
+        'button[aria-label*="like" i]',
+    ],
+    LOGIN_USERNAME: ['input[autocomplete="username"]', 'input[name="text"]'],
+    LOGIN_PASSWORD: ['input[type="password"]', 'input[name="password"]'],
+    HOME_LINK: ['a[data-testid="AppTabBar_Home_Link"]', 'a[href="/home"]'],
+    # Shown instead of the timeline on errors and rate limits
+    RETRY_BUTTON: [
+        '[data-testid="primaryColumn"] button[role="button"]',
+        '[data-testid="primaryColumn"] [role="button"]',
+    ],
+}
@@ -0,0 +1,141 @@
+import bisect
+import heapq
+import math
+import threading
+from array import array
+from itertools import islice
+from typing import Iterable, List
+
+
+MASK_64 = (1 << 64) - 1
+
+# How a TweetExtractor keeps the tweets of earlier runs
+EXACT = "exact"
+BLOOM = "bloom"
+
+
+def mix64(value: int) -> int:
+    """splitmix64 finalizer: spreads sequential status IDs over all 64 bits"""
+    value = (value + 0x9E3779B97F4A7C15) & MASK_64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK_64
+    return value ^ (value >> 31)
+
+
+class StatusIdSet:
+    """Exact set of 64-bit status IDs at 8 bytes per ID.
+
+    IDs live in a sorted array searched with bisect. New IDs go to a small
+    set first and are merged into the array once it holds more than an
+    eighth of the array, so adds stay cheap on average. A set of URL strings
+    costs well over 100 bytes per tweet.
+    """
+
+    def __init__(self, ids: Iterable[int] = ()):
+        self.sorted_ids = array("Q")
+        self.recent = set()
+        self._lock = threading.Lock()
+        self.update(ids)
+
+    def __contains__(self, status_id: int) -> bool:
+        if status_id in self.recent:
+            return True
+        ids = self.sorted_ids
+        i = bisect.bisect_left(ids, status_id)
+        return i < len(ids) and ids[i] == status_id
+
+    def __len__(self) -> int:
+        return len(self.sorted_ids) + len(self.recent)
+
+    def add(self, status_id: int) -> bool:
+        """Add an ID, returning False if it was already present"""
+        with self._lock:
+            if status_id in self:
+                return False
+            self.recent.add(status_id)
+            if len(self.recent) > max(4096, len(self.sorted_ids) // 8):
+                self.merge()
+            return True
+
+    def update(self, ids: Iterable[int], chunk_size: int = 1 << 20):
+        """Bulk load IDs, chunk_size at a time; faster than add() one by one"""
+        ids = iter(ids)
+        while True:
+            chunk = set(islice(ids, chunk_size))
+            if not chunk:
+                return
+            with self._lock:
+                self.recent.update(i for i in chunk if i not in self)
+                self.merge()
+
+    def merge(self):
+        if not self.recent:
+            return
+        merged = array("Q")
+        merged.extend(heapq.merge(self.sorted_ids, sorted(self.recent)))
+        # Readers may be searching the old array: swap, don't mutate
+        self.sorted_ids = merged
+        self.recent = set()
+
+
+class BloomFilter:
+    """Approximate set of status IDs with a chosen false positive rate.
+
+    Sized for capacity IDs: at the default 0.1% that is about 1.8 bytes per
+    ID. A lookup can wrongly say an ID is present, never that it is absent,
+    so callers that can't accept false positives confirm hits elsewhere.
+    """
+
+    def __init__(self, capacity: int, false_positive_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.size = max(
+            8,
+            math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2),
+        )
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def positions(self, status_id: int) -> List[int]:
+        # Double hashing: bit i is first + i * second
+        mixed = mix64(status_id)
+        position, step = mixed & 0xFFFFFFFF, (mixed >> 32) | 1
+        positions = []
+        for _ in range(self.hashes):
+            positions.append(position % self.size)
+            position += step
+        return positions
+
+    def __contains__(self, status_id: int) -> bool:
+        bits = self.bits
+        for position in self.positions(status_id):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, status_id: int) -> bool:
+        """Add an ID, returning False if it (probably) was already present"""
+        with self._lock:
+            return self._add(status_id)
+
+    def _add(self, status_id: int) -> bool:
+        bits = self.bits
+        new = False
+        for position in self.positions(status_id):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+    def update(self, ids: Iterable[int]):
+        """Bulk load IDs under a single lock acquisition"""
+        with self._lock:
+            for status_id in ids:
+                self._add(status_id)
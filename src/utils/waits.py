@@ -0,0 +1,171 @@
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
+import logging
+import threading
+import time
+import weakref
+from typing import Dict, Optional
+
+
+# Scrolls down by arguments[3] viewports (to the bottom when 0), then
+# resolves as soon as new nodes matching arguments[0] were rendered (or the
+# page grew or the scroll revealed more of it) and the DOM has been quiet for
+# arguments[1] ms, or when arguments[2] ms have passed. Resolves with whether
+# there was new content and whether the page grew, which means the site
+# fetched more of the timeline.
+SCROLL_AND_WAIT_SCRIPT = """
+const [selector, quietMs, maxMs, step, done] = arguments;
+const start = performance.now();
+const startHeight = document.body.scrollHeight;
+const startY = window.scrollY;
+let sawNew = false;
+let grew = false;
+let lastMutation = start;
+const observer = new MutationObserver((mutations) => {
+    lastMutation = performance.now();
+    if (sawNew) return;
+    for (const mutation of mutations) {
+        for (const node of mutation.addedNodes) {
+            if (node.nodeType === 1 && (node.matches(selector) || node.querySelector(selector))) {
+                sawNew = true;
+                return;
+            }
+        }
+    }
+});
+observer.observe(document.body, {childList: true, subtree: true});
+if (step > 0) {
+    window.scrollBy(0, Math.max(Math.floor(window.innerHeight * step), 1));
+} else {
+    window.scrollTo(0, document.body.scrollHeight);
+}
+// Cells that were already loaded below the viewport count as new content
+if (window.scrollY !== startY) sawNew = true;
+const timer = setInterval(() => {
+    const now = performance.now();
+    if (document.body.scrollHeight !== startHeight) {
+        sawNew = true;
+        grew = true;
+    }
+    if ((sawNew && now - lastMutation >= quietMs) || now - start >= maxMs) {
+        clearInterval(timer);
+        observer.disconnect();
+        done({new: sawNew, grew: grew});
+    }
+}, 50);
+"""
+
+
+class AdaptiveWaiter:
+    """Waits that return as soon as the page is ready, bounded by max_wait.
+
+    Every wait records how long it actually took under its name so slow steps
+    show up in summary(); only running totals are kept, so a long-lived
+    waiter doesn't grow. Scrolls move scroll_step viewports at a time so a
+    virtualized timeline renders every cell on the way down; 0 jumps straight
+    to the bottom.
+    """
+
+    def __init__(
+        self,
+        max_wait: float = 10.0,
+        quiet_period: float = 0.3,
+        poll_interval: float = 0.1,
+        scroll_step: float = 0.9,
+    ):
+        self.max_wait = max_wait
+        self.quiet_period = quiet_period
+        self.poll_interval = poll_interval
+        self.scroll_step = scroll_step
+        self.timings: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self._configured_drivers = weakref.WeakSet()
+
+    def record(self, name: str, started: float) -> float:
+        elapsed = time.time() - started
+        with self._lock:
+            timing = self.timings.setdefault(
+                name, {"count": 0, "total": 0.0, "max": 0.0}
+            )
+            timing["count"] += 1
+            timing["total"] += elapsed
+            timing["max"] = max(timing["max"], elapsed)
+        logging.debug(f"Wait '{name}' took {elapsed:.3f}s")
+        return elapsed
+
+    def until(self, driver, condition, name: str, max_wait: Optional[float] = None):
+        """Wait for a WebDriverWait condition, returning its result or None"""
+        started = time.time()
+        try:
+            return WebDriverWait(
+                driver,
+                max_wait if max_wait is not None else self.max_wait,
+                poll_frequency=self.poll_interval,
+            ).until(condition)
+        except TimeoutException:
+            logging.debug(f"Wait '{name}' timed out")
+            return None
+        finally:
+            self.record(name, started)
+
+    def for_page_load(self, driver, name: str = "page_load") -> bool:
+        return bool(
+            self.until(
+                driver,
+                lambda d: d.execute_script("return document.readyState")
+                == "complete",
+                name,
+            )
+        )
+
+    def scroll_and_wait(
+        self,
+        driver,
+        selector: str,
+        name: str = "scroll",
+        result: Optional[Dict] = None,
+    ) -> bool:
+        """Scroll down one step and wait for new matching nodes to settle.
+
+        Returns False if nothing new rendered within max_wait. When result is
+        given, result["fetched"] is set to whether the page grew, i.e. the
+        scroll made the site load more content.
+        """
+        started = time.time()
+        try:
+            if driver not in self._configured_drivers:
+                driver.set_script_timeout(self.max_wait + 5)
+                self._configured_drivers.add(driver)
+            outcome = driver.execute_async_script(
+                SCROLL_AND_WAIT_SCRIPT,
+                selector,
+                int(self.quiet_period * 1000),
+                int(self.max_wait * 1000),
+                self.scroll_step,
+            )
+            outcome = outcome or {}
+            if result is not None:
+                result["fetched"] = bool(outcome.get("grew"))
+            return bool(outcome.get("new"))
+        except Exception as e:
+            logging.error(f"Error waiting for new content: {e}")
+            return False
+        finally:
+            self.record(name, started)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                name: {
+                    "count": timing["count"],
+                    "total": round(timing["total"], 3),
+                    "mean": round(timing["total"] / timing["count"], 3),
+                    "max": round(timing["max"], 3),
+                }
+                for name, timing in self.timings.items()
+            }
+
+    def reset(self):
+        """Forget the recorded waits, e.g. before the next daemon job"""
+        with self._lock:
+            self.timings = {}
@@ -0,0 +1,113 @@
+import pytest
+
+from src.models.tweet import Tweet
+from src.savers.near_duplicate_index import DROP, LINK, NearDuplicateIndex
+
+
+ORIGINAL = (
+    "Se registró un nuevo ataque armado en el centro de Guayaquil esta noche, "
+    "la policía investiga a los responsables"
+)
+
+DUPLICATES = {
+    "retweet with link": (
+        "RT @diario: Se registró un nuevo ataque armado en el centro de Guayaquil "
+        "esta noche, la policía investiga a los responsables https://t.co/abc123"
+    ),
+    "mention and hashtag": (
+        "@alcaldia Se registró un nuevo ataque armado en el centro de Guayaquil "
+        "esta noche, la policía investiga a los responsables #SeguridadGYE"
+    ),
+    "case and accents": (
+        "SE REGISTRO UN NUEVO ATAQUE ARMADO EN EL CENTRO DE GUAYAQUIL ESTA NOCHE, "
+        "LA POLICIA INVESTIGA A LOS RESPONSABLES"
+    ),
+    "word dropped": (
+        "Se registró un ataque armado en el centro de Guayaquil esta noche, "
+        "la policía investiga a los responsables"
+    ),
+    "word changed": (
+        "Se registró un nuevo ataque armado en el norte de Guayaquil esta noche, "
+        "la policía investiga a los responsables"
+    ),
+    "two words changed": (
+        "Se reportó un nuevo ataque armado en el norte de Guayaquil esta noche, "
+        "la policía investiga a los responsables"
+    ),
+}
+
+DISTINCT = {
+    "same topic": (
+        "La policía de Guayaquil detuvo a dos sospechosos del ataque armado "
+        "registrado anoche en el centro"
+    ),
+    "same place": (
+        "Vecinos del sur de Guayaquil denuncian falta de patrullaje y piden más "
+        "seguridad en sus barrios"
+    ),
+    "unrelated": (
+        "Hoy se inauguró el nuevo parque en Samborondón con actividades para toda "
+        "la familia"
+    ),
+}
+
+
+def make_tweet(status_id: int, text: str) -> Tweet:
+    return Tweet(
+        username="@usuario",
+        text=text,
+        tweet_url=f"https://x.com/usuario/status/{status_id}",
+        timestamp="2025-01-12T13:14:47.000Z",
+        collection_time="2025-01-12T13:20:00",
+    )
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "near_duplicates.db"))
+    assert index.check(make_tweet(1, ORIGINAL)) is None
+    yield index
+    index.close()
+
+
+@pytest.mark.parametrize("name", sorted(DUPLICATES))
+def test_near_duplicates_match_the_original(index, name):
+    tweet = make_tweet(2, DUPLICATES[name])
+    assert index.check(tweet) == "https://x.com/usuario/status/1"
+
+
+@pytest.mark.parametrize("name", sorted(DISTINCT))
+def test_distinct_tweets_are_not_matched(index, name):
+    assert index.check(make_tweet(2, DISTINCT[name])) is None
+
+
+def test_short_tweets_are_never_matched(index):
+    assert index.check(make_tweet(2, "Ataque armado en Guayaquil")) is None
+
+
+def test_filter_links_or_drops_duplicates(index):
+    tweets = [
+        make_tweet(2, DUPLICATES["word dropped"]),
+        make_tweet(3, DISTINCT["unrelated"]),
+    ]
+    kept = index.filter(tweets, mode=LINK)
+    assert [tweet.duplicate_of for tweet in kept] == [
+        "https://x.com/usuario/status/1",
+        None,
+    ]
+    kept = index.filter([make_tweet(4, DUPLICATES["retweet with link"])], mode=DROP)
+    assert kept == []
+
+
+def test_canonical_tweets_are_kept_across_runs(tmp_path):
+    path = str(tmp_path / "near_duplicates.db")
+    first_run = NearDuplicateIndex(path)
+    first_run.filter([make_tweet(1, ORIGINAL)])
+    first_run.close()
+
+    second_run = NearDuplicateIndex(path)
+    assert second_run.check(make_tweet(1, ORIGINAL)) is None
+    assert second_run.check(make_tweet(2, DUPLICATES["word changed"])) == (
+        "https://x.com/usuario/status/1"
+    )
+    second_run.close()